@@ -8,17 +8,12 @@
 # parameters in a given session.
 ###############################################################################
 import os
+import sys
 import datetime
 import importlib
-import smtplib
-from email.mime.base import MIMEBase
-from email import encoders
 
-from utils import autoemail
-
-
-# LOAD CREDENTIALS
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = ""    # FIXME: add cloud credentials here
+from utils import registry
+from utils import tracing
 
 
 # CONFIG
@@ -26,6 +21,9 @@ strategy_directory = 'strategies'
 output_directory = 'output'
 strategy_runfile_name = 'main'
 strategy_runfile_method = 'run_strategies'
+trace_pipeline = True    # record per-stage timings for the run
+trace_memory = False    # also record peak memory per stage (several times slower), or pass --trace-memory
+trace_directory = os.path.join(output_directory, 'traces')
 strategy_run_list = [
     'example1',
     'example2',
@@ -35,12 +33,17 @@ strategy_run_list = [
 
 # FUNCTIONS
 def email_results():
-""" Takes the output from the batch run, generates the appropriate pdf report with results, then emails it out to
-the recipient list defined in the project config file. """
+    """ Takes the output from the batch run, finds the pdf report generated for each strategy, then emails it out to
+    the recipient list defined in the project config file. One pooled set of SMTP connections is shared by the whole
+    batch and each report email is built once for all recipients. """
 
-    for strategy in os.listdir(strategy_directory):    # find every available strategy for testing
+    from utils import autoemail    # imported here so listing runs do not need the email config
 
-        if strategy in strategy_run_list:    # confirm whether we want to run it
+    with tracing.span('email'), autoemail.EmailDispatcher() as dispatcher:
+        deliveries = []
+        for strategy in os.listdir(strategy_directory):    # find every available strategy for testing
+
+            if strategy in strategy_run_list:    # confirm whether we want to run it
 
                 print('Emailing results report for: {}'.format(strategy) + ' [' + str(datetime.datetime.utcnow()) + ']')
 
@@ -56,18 +59,15 @@ the recipient list defined in the project config file. """
                     if 'pdf' in file:
                         pdf_name = os.path.join(output_directory, strategy, file)
 
-                binary_pdf = open(pdf_name, 'rb')    # open in binary
-                payload = MIMEBase('application', 'octate-stream', Name=pdf_name)
-                payload.set_payload((binary_pdf).read())
-                encoders.encode_base64(payload)    # encode binary to base 64
-                payload.add_header('Content-Decomposition', 'attachment', filename=pdf_name)    # add header with pdf name
-                attachment = payload
+                email = autoemail.build_message(subject, message, footer, pdf_name)    # build and encode once
+                deliveries.append(dispatcher.send(email))    # send the email in the background
 
-                autoemail.send_email_with_attachment(subject, message, footer, attachment)    # send the email
+        for delivery in deliveries:
+            delivery.result()    # surface any failed sends
 
 
 def run_batches():
-"""" Finds and executes the 'run()' method for every strategy in the user-defined run list at the top of this file. """
+    """ Finds and executes the 'run()' method for every strategy in the user-defined run list at the top of this file. """
 
     for strategy in os.listdir(strategy_directory):    # find every available strategy for testing
 
@@ -77,12 +77,49 @@ def run_batches():
             import_path = ".".join([strategy_directory, strategy, strategy_runfile_name])    # define the strategy module location
             module = importlib.import_module(import_path)    # import module
             method = getattr(module, strategy_runfile_method)    # extract run method
-            method()    # execute run method
+            with tracing.span('run_strategies', strategy=strategy):
+                method()    # execute run method
+
+
+def list_strategies():
+    """ Dry run: prints every strategy that would be run and its parameters, read from the strategy source files
+    without importing them (so nothing heavy like pandas or matplotlib gets loaded). """
+
+    for strategy in os.listdir(strategy_directory):    # find every available strategy for testing
+
+        if strategy in strategy_run_list:    # confirm whether we want to run it
+
+            strategy_path = os.path.join(strategy_directory, strategy)
+            runfile_config = registry.read_module_constants(os.path.join(strategy_path, strategy_runfile_name + '.py'))
+            print('{} ({} variants)'.format(strategy, len(runfile_config.get('strategy_run_list', []))))
+            for file_name, entry in registry.discover_strategies(strategy_path, runfile_config.get('strategy_run_list')).items():
+                print('    ' + file_name + ': ' + ', '.join('{}={}'.format(k, v) for k, v in entry['attributes'].items()))
+
+
+def export_traces():
+    """ Writes the spans recorded during the run to json and chrome trace files and prints the slowest stages. """
+
+    run_name = datetime.datetime.utcnow().strftime('%Y-%m-%d_%H%M%S')
+    tracing.export_json(os.path.join(trace_directory, 'trace_' + run_name + '.json'))
+    tracing.export_chrome_trace(os.path.join(trace_directory, 'trace_' + run_name + '.chrome.json'))
+
+    print('\nSlowest stages:')
+    for stage in tracing.summarize()[:10]:
+        print('{:<45} {:>5} calls {:>10.3f} s wall {:>10.3f} s cpu {:>10.1f} MB peak'.format(
+            stage['name'], stage['calls'], stage['wall_s'], stage['cpu_s'], stage['peak_mb']))
 
 
 # RUN BATCH TEST
 if __name__ == '__main__':
+    if '--list' in sys.argv[1:]:    # dry run, only list what would be run
+        list_strategies()
+        sys.exit(0)
+
     print('\nStarting up the EOC Offline Backtester [' + str(datetime.datetime.utcnow()) + ']\n')
+    if trace_pipeline:
+        tracing.enable(memory=trace_memory or '--trace-memory' in sys.argv[1:])
     run_batches()
     email_results()
+    if trace_pipeline:
+        export_traces()
     print('\nEOC Offline Backtester is finished running! [' + str(datetime.datetime.utcnow()) + ']\n')
@@ -0,0 +1,305 @@
+###############################################################################
+# FILENAME: benchmark.py
+# PROJECT: EOC Offline Backtesting Tool
+# CLIENT:
+# AUTHOR: Matt Hartigan
+# DATE CREATED: 19 Oct 2026
+# DESCRIPTION: Benchmark suite for the indicator and performance libraries.
+# Times every function on synthetic OHLCV data over a range of data sizes and
+# rolling windows, records wall time and peak memory, and compares the results
+# against stored baselines so slowdowns get caught. Runs offline with only
+# numpy and pandas.
+#
+# Usage (from the repo root):
+#   python -m benchmarks.benchmark --update-baseline    # record baselines
+#   python -m benchmarks.benchmark                      # check for regressions
+#   python -m benchmarks.benchmark --precision          # check compact mode precision bounds
+###############################################################################
+import os
+import sys
+import json
+import time
+import argparse
+import warnings
+import tracemalloc
+import datetime
+import numpy as np
+import pandas as pd
+
+from utils import compact
+from utils import indicators
+from utils import performance
+
+
+# CONFIG
+default_sizes = [10**3, 10**4, 10**5, 10**6, 10**7]    # number of bars
+default_windows = [14, 50, 200]    # rolling windows
+default_repeats = 3    # timed runs per case, best one is kept
+precision_sizes = [10**4]    # number of bars used for the compact mode precision check
+default_tolerance = 0.25    # fractional slowdown allowed before a case counts as a regression
+min_regression_time = 0.005    # seconds, differences below this are treated as timer noise
+min_regression_memory = 1.0    # MB, differences below this are treated as noise
+baseline_path = os.path.join(os.path.dirname(__file__), 'baselines.json')
+bet = 100    # usd
+
+# name: (function, max bars, takes a rolling window). Functions with python level loops or
+# O(n * window) memory are capped so a full run stays finite.
+benchmark_cases = {
+    'indicators.bollinger_band': (lambda df, w: indicators.bollinger_band(df, 'Close', w, 2), 10**7, True),
+    'indicators.roc': (lambda df, w: indicators.roc(df, 'Close', w), 10**7, True),
+    'indicators.sma': (lambda df, w: indicators.sma(df, 'Close', w), 10**7, True),
+    'indicators.zlema': (lambda df, w: indicators.zlema(df, 'Close', w), 10**4, True),
+    'indicators.momentum': (lambda df, w: indicators.momentum(df, 'Close', w), 10**7, True),
+    'indicators.cci': (lambda df, w: indicators.cci(df, 'High', 'Low', 'Close', w), 10**6, True),
+    'indicators.rsi': (lambda df, w: indicators.rsi(df, 'Close', w), 10**4, True),
+    'indicators.money_flow_index': (lambda df, w: indicators.money_flow_index(df, 'Close', 'High', 'Low', 'Volume', w), 10**7, True),
+    'indicators.chande_momentum_oscillator': (lambda df, w: indicators.chande_momentum_oscillator(df, 'Close', w), 10**7, True),
+    'indicators.annualized_historical_volatility': (lambda df, w: indicators.annualized_historical_volatility(df, 'Close', w), 10**7, True),
+    'indicators.garman_klass_volatility': (lambda df, w: indicators.garman_klass_volatility(df, 'Open', 'High', 'Low', 'Close', w), 10**7, True),
+    'indicators.vwap': (lambda df, w: indicators.vwap(df, 'Close', 'High', 'Low', 'Volume', w), 10**7, True),
+    'performance.sum_capital_invested': (lambda df, w: performance.sum_capital_invested(df, bet, 'Close', 'action'), 10**7, False),
+    'performance.sum_btc_accumulated': (lambda df, w: performance.sum_btc_accumulated(df, bet, 'Close', 'action'), 10**7, False),
+}
+
+
+# FUNCTIONS
+def generate_synthetic_ohlcv(num_bars, seed=0, start='2020-01-01', freq_seconds=3600):
+    """ Generates a synthetic OHLCV data frame shaped like the cleaned data feed (Open, High,
+    Low, Close, Volume, Unix, UTC) from a geometric random walk. A random "action" column with
+    occasional "Buy" signals is added so the performance functions can be benchmarked too. """
+
+    rng = np.random.default_rng(seed)
+
+    log_returns = rng.normal(0, 0.01, num_bars)
+    close = 10000 * np.exp(np.cumsum(log_returns))
+    open_ = np.concatenate(([close[0]], close[:-1]))    # open at previous close
+    spread = np.abs(rng.normal(0, 0.005, (2, num_bars)))
+    high = np.maximum(open_, close) * (1 + spread[0])
+    low = np.minimum(open_, close) * (1 - spread[1])
+    volume = rng.lognormal(3, 1, num_bars)
+    unix = pd.Timestamp(start).value // 10**9 + np.arange(num_bars, dtype=np.int64) * freq_seconds
+
+    return pd.DataFrame({
+        'Open': open_,
+        'High': high,
+        'Low': low,
+        'Close': close,
+        'Volume': volume,
+        'Unix': unix,
+        'UTC': pd.to_datetime(unix, unit='s'),
+        'action': np.where(rng.random(num_bars) < 0.05, 'Buy', 'No Action'),
+    })
+
+
+def time_case(func, df, window, repeats):
+    """ Returns (best wall time in seconds, peak traced memory in MB) for a single benchmark
+    case. Memory is measured on a separate traced run so tracing overhead does not skew the
+    timings. """
+
+    wall_times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(df, window)
+        wall_times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(df, window)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return min(wall_times), peak / 2**20
+
+
+def run_benchmarks(sizes=default_sizes, windows=default_windows, repeats=default_repeats, only=None, compact_mode=False):
+    """ Runs every benchmark case (optionally only those whose name contains one of the
+    strings in "only") for every size and window, and returns the results keyed by case id.
+    Cases that raise are recorded as {'error': ...} instead of timings.
+    With "compact_mode" the synthetic data is converted to compact (float32) form first and
+    case ids are tagged with '|compact'. """
+
+    results = {}
+    for num_bars in sizes:
+        df = generate_synthetic_ohlcv(num_bars)
+        if compact_mode:
+            df = compact.compact_ohlcv(df)
+
+        for name, (func, max_bars, windowed) in benchmark_cases.items():
+            if only and not any(o in name for o in only):
+                continue
+            if num_bars > max_bars:
+                continue
+
+            for window in (windows if windowed else [None]):
+                if window is not None and window >= num_bars:
+                    continue
+                case_id = '{}|n={}|w={}'.format(name, num_bars, window) + ('|compact' if compact_mode else '')
+                try:
+                    with warnings.catch_warnings():
+                        warnings.simplefilter('ignore')
+                        wall_time, peak_mb = time_case(func, df, window, repeats)
+                except Exception as e:    # keep benchmarking the other cases, the failure counts as a regression
+                    tracemalloc.stop()
+                    results[case_id] = {'error': repr(e)}
+                    print('{:<75} FAILED: {!r}'.format(case_id, e))
+                    continue
+                results[case_id] = {'wall_s': wall_time, 'peak_mb': peak_mb}
+                print('{:<75} {:>10.4f} s {:>10.1f} MB'.format(case_id, wall_time, peak_mb))
+
+        del df
+
+    return results
+
+
+def case_selected(case_id, sizes, windows, only=None, compact_mode=False):
+    """ Returns whether the case id (e.g. 'indicators.sma|n=1000|w=14') falls within a run over
+    the input sizes, windows and name filters. """
+
+    parts = case_id.split('|')
+    name, num_bars, window = parts[0], int(parts[1][2:]), parts[2][2:]
+    return ((not only or any(o in name for o in only)) and num_bars in sizes
+            and (window == 'None' or int(window) in windows) and (parts[-1] == 'compact') == compact_mode)
+
+
+def find_regressions(results, baselines, tolerance=default_tolerance, selected=None):
+    """ Compares results against baselines and returns a list of human readable regression
+    messages for every case that failed, every baselined case missing from the results (only
+    those for which "selected(case_id)" is true, if given) and every case whose wall time or
+    peak memory grew by more than "tolerance". """
+
+    regressions = []
+    for case_id in baselines:
+        if case_id not in results and (selected is None or selected(case_id)):
+            regressions.append('{}: missing from this run'.format(case_id))
+
+    for case_id, result in results.items():
+        if 'error' in result:
+            regressions.append('{}: FAILED {}'.format(case_id, result['error']))
+            continue
+        baseline = baselines.get(case_id)
+        if baseline is None:
+            continue
+
+        checks = [('wall_s', 's', min_regression_time), ('peak_mb', 'MB', min_regression_memory)]
+        for metric, unit, noise in checks:
+            limit = baseline[metric] * (1 + tolerance)
+            if result[metric] > limit and result[metric] - baseline[metric] > noise:
+                regressions.append('{} {}: {:.4f} {} vs baseline {:.4f} {} (+{:.0%})'.format(
+                    case_id, metric, result[metric], unit, baseline[metric], unit, result[metric] / baseline[metric] - 1))
+
+    return regressions
+
+
+def check_precision(sizes=precision_sizes, windows=default_windows, only=None):
+    """ Runs every benchmark case on the same synthetic data in float64 and in compact
+    (float32) form and compares every output column the case adds. Returns a list of human
+    readable messages for every case that raises (so it could not be checked), every column
+    whose error is beyond its bound in compact.precision_bounds and every column whose NaN
+    positions differ. """
+
+    violations = []
+    for num_bars in sizes:
+        reference_df = generate_synthetic_ohlcv(num_bars)
+        compact_df = compact.compact_ohlcv(reference_df)
+
+        for name, (func, max_bars, windowed) in benchmark_cases.items():
+            if only and not any(o in name for o in only):
+                continue
+            if num_bars > max_bars:
+                continue
+            bound = compact.precision_bounds.get(name, compact.default_precision_bound)
+
+            for window in (windows if windowed else [None]):
+                if window is not None and window >= num_bars:
+                    continue
+                case_id = '{}|n={}|w={}'.format(name, num_bars, window)
+                try:
+                    with warnings.catch_warnings():
+                        warnings.simplefilter('ignore')
+                        reference = func(reference_df, window)
+                        result = func(compact_df, window)
+                except Exception as e:    # keep checking the other cases, an unchecked case is a violation
+                    violations.append('{}: FAILED {!r}'.format(case_id, e))
+                    print('{:<75} FAILED: {!r}'.format(case_id, e))
+                    continue
+
+                for column in reference.columns.difference(reference_df.columns):
+                    error, nan_mismatch = compact.precision_error(reference[column], result[column])
+                    print('{:<75} {:>10.2e} (bound {:.0e}) {}'.format(case_id + '|' + column, error, bound, result[column].dtype))
+                    if error > bound or nan_mismatch:
+                        violations.append('{}|{}: error {:.2e} vs bound {:.0e}, {} NaN mismatches'.format(case_id, column, error, bound, nan_mismatch))
+
+    return violations
+
+
+def load_baselines(path=baseline_path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def save_baselines(results, path=baseline_path):
+    """ Merges the input results into the baseline file so partial runs only overwrite the
+    cases they covered. Failed cases are not stored. """
+
+    baselines = load_baselines(path)
+    baselines.update({case_id: result for case_id, result in results.items() if 'error' not in result})
+    with open(path, 'w') as f:
+        json.dump({'updated': str(datetime.datetime.utcnow()), 'results': baselines}, f, indent=2, sort_keys=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the indicator and performance libraries.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=default_sizes, help='number of bars to benchmark')
+    parser.add_argument('--windows', type=int, nargs='+', default=default_windows, help='rolling windows to benchmark')
+    parser.add_argument('--repeats', type=int, default=default_repeats, help='timed runs per case (best is kept)')
+    parser.add_argument('--only', nargs='+', help='only run cases whose name contains one of these strings')
+    parser.add_argument('--tolerance', type=float, default=default_tolerance, help='allowed fractional slowdown vs baseline')
+    parser.add_argument('--baseline', default=baseline_path, help='baseline file to compare against / update')
+    parser.add_argument('--update-baseline', action='store_true', help='store these results as the new baselines')
+    parser.add_argument('--output', help='also write these results to a json file')
+    parser.add_argument('--compact', action='store_true', help='benchmark on compact (float32) data')
+    parser.add_argument('--precision', action='store_true', help='check compact mode outputs against float64 instead of timing')
+    args = parser.parse_args(argv)
+
+    if args.precision:
+        print('Checking EOC compact mode precision... [' + str(datetime.datetime.utcnow()) + ']\n')
+        violations = check_precision(windows=args.windows, only=args.only)
+        if violations:
+            print('\n{} failed case(s) or output(s) beyond their precision bound:'.format(len(violations)))
+            for violation in violations:
+                print('  ' + violation)
+            return 1
+        print('\nAll compact mode outputs within their precision bounds.')
+        return 0
+
+    print('Running EOC indicator benchmarks... [' + str(datetime.datetime.utcnow()) + ']\n')
+    results = run_benchmarks(args.sizes, args.windows, args.repeats, args.only, args.compact)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        save_baselines(results, args.baseline)
+        print('\nBaselines updated: {}'.format(args.baseline))
+        baselines = {}    # only failed cases count as regressions
+    else:
+        baselines = load_baselines(args.baseline)
+        if not baselines:
+            print('\nNo baselines found at {}, run with --update-baseline first.'.format(args.baseline))
+
+    selected = lambda case_id: case_selected(case_id, args.sizes, args.windows, args.only, args.compact)
+    regressions = find_regressions(results, baselines, args.tolerance, selected)
+    if regressions:
+        print('\n{} regression(s) (failed or missing cases, or beyond {:.0%} tolerance):'.format(len(regressions), args.tolerance))
+        for regression in regressions:
+            print('  ' + regression)
+        return 1
+
+    print('\nNo regressions beyond {:.0%} tolerance.'.format(args.tolerance))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
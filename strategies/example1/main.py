@@ -12,25 +12,58 @@
 ###############################################################################
 import os
 import importlib
+import queue
+import multiprocessing
+import concurrent.futures
 import pandas as pd
 import numpy as np
 import datetime
 import statistics as stats
 import math
 
-from google.cloud import storage
-
+from utils import compact
+from utils import datasource
+from utils import indicators
 from utils import performance
-from strategies.cci import report
+from utils import registry
+from utils import resample
+from utils import reporting
+from utils import results_store
+from utils import robustness
+from utils import tracing
 
 
 # CONFIG
 path = 'strategies/example1'
 runfile_method = 'apply_strategy'
-attribute_method = 'get_attributes'
 cutoff_string = "2020-01-01"
 starting_capital = 10000    # usd
 bet = 100    # usd
+report_mode = 'ranked'    # 'full' for a detail page per strategy, 'ranked' for large sweeps, 'streaming' to build the report as strategies finish
+rank_metric = 'final_btc_balance'    # summary field used to rank strategies in 'ranked' and 'streaming' mode
+report_top_k = 10    # number of detail pages included in 'ranked' mode
+results_memory_budget_mb = 2048    # results frames beyond this are spilled to disk until the report is generated
+results_spill_directory = None    # None uses a temporary directory
+data_source = 'local'    # 'local' reads raw data feed blobs from raw_data_directory, 'gcs' from the gcs_bucket
+raw_data_directory = 'data/raw'    # local stand-in for the cloud bucket, one folder of raw csv files per symbol
+gcs_bucket = ''    # FIXME: add bucket name here
+gcs_credentials_path = None    # service account json, None uses the default google credentials
+local_data_directory = 'data/local'    # synced, month partitioned copy of the raw data
+base_timeframe = '1h'    # bar size of the raw data feed
+universe = [    # (symbol, timeframe) pairs every strategy is run on, higher timeframes are resampled from the base data
+    ('BTCUSD', '1h'),
+    ('BTCUSD', '4h'),
+    ('BTCUSD', '1d'),
+]
+max_workers = None    # processes used to evaluate the universe in parallel, None uses every cpu
+results_queue_size = 2    # finished results frames waiting to be collected from the workers at any time
+resample_cache_directory = None    # set to keep resampled data between runs
+robustness_paths = 0    # bootstrapped price paths each strategy is also tested on per (symbol, timeframe) pair, 0 to skip
+robustness_block_size = 24    # bars per bootstrap block
+robustness_path_length = None    # bars per simulated path, None uses the full history length
+robustness_chunk_size = 250    # paths simulated at once, bounds memory
+compact_mode = False    # float32 prices and indicators with int64 epoch second timestamps, see utils/compact.py for precision bounds
+signal_metrics = ['num_triggers', 'final_btc_balance']    # summary fields that only depend on the buy signal, shared by duplicate signals
 strategy_run_list = [
     'strategy1.py',
     'strategy2.py',
@@ -39,51 +72,243 @@ strategy_run_list = [
 
 
 # FUNCTIONS
-def run_strategies():
+def get_object_store():
+    """ Returns the object store configured as the raw data feed source. """
 
-    print('Evaluating Example#1 strategy performance... [' + str(datetime.datetime.utcnow()) + ']\n')
+    if data_source == 'gcs':
+        return datasource.GCSObjectStore(gcs_bucket, gcs_credentials_path)
+    return datasource.LocalObjectStore(raw_data_directory)
+
+
+def load_data(symbol, object_store=None):
+    """ Syncs any new bars for a single symbol into the local data store, then loads and cleans its base timeframe
+    OHLCV history. """
+
+    local_store = datasource.PartitionedStore(local_data_directory)
+
+    # SYNC DATA
+    with tracing.span('sync', symbol=symbol):
+        new_bars = datasource.sync(object_store or get_object_store(), local_store, symbol)
+        print('Synced {} new bars for {} ['.format(new_bars, symbol) + str(datetime.datetime.utcnow()) + ']')
 
     # LOAD DATA
-    df = pd.read_csv('')    # FIXME: data feed goes here
+    with tracing.span('load', symbol=symbol):
+        df = local_store.load(symbol, since=cutoff_string)    # only partitions from the cutoff onwards
 
     # CLEAN DATA
-    df.columns = [ "Open", "High", "Low", "Close", "Volume", "Unix", "UTC"]    # rename columns
-    df['UTC'] = df['UTC'].apply(lambda x: datetime.datetime.strptime(x, '%Y-%m-%d %H:%M:%S'))    # add utc
-    df = df[(df['UTC'] >= cutoff_string)]    # only take data from cutoff string onwards
+    with tracing.span('clean', symbol=symbol):
+        df.columns = [ "Open", "High", "Low", "Close", "Volume", "Unix", "UTC"]    # rename columns
+        if compact_mode:
+            df = compact.compact_ohlcv(df)    # float32 prices, int64 epoch second timestamps
+            df = df[(df['UTC'] >= int(pd.Timestamp(cutoff_string).timestamp()))]    # only take data from cutoff string onwards
+        else:
+            df['UTC'] = df['UTC'].apply(lambda x: datetime.datetime.strptime(x, '%Y-%m-%d %H:%M:%S'))    # add utc
+            df = df[(df['UTC'] >= cutoff_string)]    # only take data from cutoff string onwards
 
-    # RUN BACKTESTS
-    strategy_results_dict = {}
-    strategy_summary_dict = {}
-    for strategy in os.listdir(path):
+    return df
 
-        if strategy in strategy_run_list:
 
-            input_df = df.copy()
+def evaluate_strategies(df, symbol, timeframe, strategies):
+    """ Applies every strategy in "strategies" (registry entries) to the data for one (symbol, timeframe) pair and
+    evaluates its performance. Runs in a worker process, so it only relies on pandas and the utils libraries.
+    Strategies whose buy signal is identical to one already evaluated are not evaluated again; they get that
+    strategy's results copied into their summary, "duplicate_of" set to its key and no results data frame.
+    Yields a (key, summary, results data frame or None) tuple per strategy as soon as it is ready. """
 
-            # APPLY STRATEGY
-            import_path = ".".join(['strategies', 'example1', strategy.replace(".py", "")])    # define the strategy module location
-            module = importlib.import_module(import_path)    # import module
-            run_method = getattr(module, runfile_method)    # extract run method
-            attr_method = getattr(module, attribute_method)
+    evaluated_signals = {}    # signal fingerprint -> summary of the first strategy that produced it
+    for strategy, entry in strategies.items():
+
+        input_df = df.copy()
+
+        # APPLY STRATEGY
+        module = importlib.import_module(entry['import_path'])    # import module
+        run_method = getattr(module, runfile_method)    # extract run method
+        with tracing.span('apply_strategy', strategy=strategy, symbol=symbol, timeframe=timeframe):
             strategy_df = run_method(input_df)    # execute run method
+        if compact_mode:
+            strategy_df = compact.compact_signals(strategy_df)    # categorical action column
+
+        key = '_'.join(['cci', strategy.replace(".py", ""), symbol, timeframe])
+        summary = dict(entry['attributes'], symbol=symbol, timeframe=timeframe)
 
-            # EVALUATE PERFORMANCE
+        # SKIP DUPLICATE SIGNALS
+        fingerprint = performance.signal_fingerprint(strategy_df, 'action')
+        if fingerprint in evaluated_signals:
+            original = evaluated_signals[fingerprint]
+            summary.update({metric: original[metric] for metric in signal_metrics}, duplicate_of=original['key'])
+            yield key, summary, None
+            continue
+
+        # EVALUATE PERFORMANCE
+        with tracing.span('evaluate', strategy=strategy, symbol=symbol, timeframe=timeframe):
             evaluate_df = performance.sum_capital_invested(strategy_df, bet, 'Close', 'action')
             evaluate_df = performance.sum_btc_accumulated(strategy_df, bet, 'Close', 'action')
 
-            # SAVE RESULTS
-            strategy_results_dict['cci_' + strategy.replace(".py", "")] = evaluate_df
-            strategy_summary_dict['cci_' + strategy.replace(".py", "")] = attr_method()
-            strategy_summary_dict['cci_' + strategy.replace(".py", "")]['num_triggers'] = evaluate_df['action'].value_counts().Buy
-            strategy_summary_dict['cci_' + strategy.replace(".py", "")]['final_btc_balance'] = round(evaluate_df['rolling_btc_received'].iloc[-1], 3)
+        # SUMMARIZE RESULTS
+        summary['num_triggers'] = int((evaluate_df['action'] == 'Buy').sum())    # 0 when the strategy never buys
+        summary['final_btc_balance'] = round(evaluate_df['rolling_btc_received'].iloc[-1], 3)
+        summary['duplicate_of'] = ''
+        evaluated_signals[fingerprint] = dict(summary, key=key)
+        yield key, summary, evaluate_df
 
-    # GENERATE REPORT
+
+def init_worker(queue_for_results):
+    """ Worker process initializer, hands every worker the shared results queue. """
+
+    global results_queue
+    results_queue = queue_for_results
+
+
+def evaluate_pair(df, symbol, timeframe, strategies, trace=False, trace_memory=False):
+    """ Worker task for one (symbol, timeframe) pair. Sends each strategy's (key, summary, results data frame)
+    back through the results queue as soon as it is evaluated, so only one frame per worker is held at a time and
+    the bounded queue stops workers from running ahead of the parent. A None marks the end of the pair and is sent
+    even if evaluation fails. If "trace" is set the pair is traced in the worker and its spans are returned so the
+    parent can merge them. """
+
+    if trace:
+        tracing.enable(memory=trace_memory)    # also clears spans inherited from the parent or an earlier task
+
+    try:
+        with tracing.span('evaluate_pair', symbol=symbol, timeframe=timeframe):
+            for result in evaluate_strategies(df, symbol, timeframe, strategies):
+                results_queue.put(result)
+                del result    # release the frame before the next strategy runs
+    finally:
+        results_queue.put(None)
+
+    return list(tracing.spans) if trace else []
+
+
+def drain_results(pair_results, futures, pairs_running):
+    """ Cancels the (symbol, timeframe) pairs that have not started and discards the results of the running ones
+    until each of them has sent its end marker (or its worker has died), so no worker is left blocked on the bounded
+    results queue when the run is aborted. "pairs_running" is the number of pairs whose end marker is still due. """
+
+    pairs_running -= sum(1 for future in futures if future.cancel())    # cancelled pairs never send an end marker
+    while pairs_running:
+        try:
+            if pair_results.get(timeout=1) is None:
+                pairs_running -= 1
+        except queue.Empty:
+            if all(future.done() for future in futures):    # remaining workers died without an end marker
+                return
+
+
+def cci_threshold_signal(paths, params, cache):
+    """ Array version of the example1 strategy rule (buy whenever cci is below the threshold) used for robustness
+    testing. The cci for each lookback is computed once per batch of paths and shared through "cache". """
+
+    lookback = params['lookback']
+    if lookback not in cache:
+        cache[lookback] = indicators.cci_values(paths['High'], paths['Low'], paths['Close'], lookback)
+
+    return cache[lookback] < params['threshold']
+
+
+def run_robustness(data_cache, strategies):
+    """ Block bootstrap robustness test. Every strategy variant is evaluated on "robustness_paths" simulated price
+    paths built from each (symbol, timeframe) history, and the distributions of final btc balance and max drawdown
+    are written to a results table next to the report. """
+
+    print('Running bootstrap robustness test on {} paths... ['.format(robustness_paths) + str(datetime.datetime.utcnow()) + ']\n')
+
+    robustness_summary_dict = {}
+    for symbol, timeframe in universe:
+        variants = {strategy: entry['attributes'] for strategy, entry in strategies.items()}
+        outcomes = robustness.run_bootstrap(data_cache.get(symbol, timeframe), variants, cci_threshold_signal, bet, starting_capital,
+                                            robustness_paths, robustness_path_length, robustness_block_size, robustness_chunk_size)
+
+        for strategy, summary in robustness.summarize_distributions(outcomes).items():
+            key = '_'.join(['cci', strategy.replace(".py", ""), symbol, timeframe])
+            robustness_summary_dict[key] = dict(strategies[strategy]['attributes'], symbol=symbol, timeframe=timeframe, **summary)
+
+    ranked = reporting.rank_strategies(robustness_summary_dict, 'final_btc_balance_p50')
+    output_path = 'output/cci/CCI_Robustness_' + str(datetime.datetime.today().strftime('%Y-%m-%d')) + '.csv'
+    reporting.write_results_table(ranked, output_path)
+
+    return robustness_summary_dict
+
+
+def run_strategies():
+
+    print('Evaluating Example#1 strategy performance... [' + str(datetime.datetime.utcnow()) + ']\n')
+
+    from strategies.example1 import report    # imported here so listing/worker processes skip matplotlib and fpdf
+
+    # LOAD DATA
+    object_store = get_object_store()
+    data_cache = resample.ResampleCache(base_timeframe, resample_cache_directory)
+    for symbol in sorted({symbol for symbol, _ in universe}):
+        data_cache.add_base(symbol, load_data(symbol, object_store))
+
+    # RUN BACKTESTS
     general_params = {
         'time_history': cutoff_string,
         'starting_capital': starting_capital,
         'bet': bet,
-        'table_headers': ['Name', 'Lookback (days)', 'Threshold', 'Num. Triggers', 'Final BTC Balance']
+        'table_headers': ['Name', 'Asset', 'Timeframe', 'Lookback (bars)', 'Threshold', 'Num. Triggers', 'Final BTC Balance'],
+        'table_keys': ['name', 'symbol', 'timeframe', 'lookback', 'threshold', 'num_triggers', 'final_btc_balance'],
     }
-    report.generate_report(general_params, strategy_summary_dict, strategy_results_dict)
+    strategies = registry.discover_strategies(path, strategy_run_list)    # metadata only, modules are imported when applied
+    streaming_report = None
+    if report_mode == 'streaming':    # render each strategy's page while the next one is being run
+        streaming_report = report.StreamingReport(general_params, len(strategies) * len(universe), rank_metric)
+    strategy_results_dict = results_store.ResultsStore(results_memory_budget_mb, results_spill_directory)
+    strategy_summary_dict = {}
+    context = multiprocessing.get_context()
+    pair_results = context.Queue(maxsize=results_queue_size)
+    with tracing.span('evaluate_universe', pairs=len(universe)), concurrent.futures.ProcessPoolExecutor(
+            max_workers, mp_context=context, initializer=init_worker, initargs=(pair_results,)) as executor:
+        futures = [
+            executor.submit(evaluate_pair, data_cache.get(symbol, timeframe), symbol, timeframe, strategies,
+                            tracing.enabled, tracing.trace_memory)
+            for symbol, timeframe in universe
+        ]
+        pairs_running = len(futures)
+        try:
+            while pairs_running:    # collect strategy results one at a time as the workers finish them
+                try:
+                    result = pair_results.get(timeout=1)
+                except queue.Empty:
+                    for future in futures:
+                        if future.done() and future.exception() is not None:    # e.g. a worker process was killed
+                            future.result()
+                    continue
+                if result is None:    # a (symbol, timeframe) pair is done
+                    pairs_running -= 1
+                    continue
+
+                # SAVE RESULTS
+                key, summary, evaluate_df = result
+                strategy_summary_dict[key] = summary
+                if streaming_report is not None:
+                    streaming_report.add(key, summary, evaluate_df)    # frame is released once its page is rendered
+                elif evaluate_df is not None:    # duplicate signals share the original's results
+                    strategy_results_dict[key] = evaluate_df
+                del result, evaluate_df
+        except BaseException:    # e.g. a render error, a failed spill or ctrl-c
+            drain_results(pair_results, futures, pairs_running)    # unblock the workers so the executor can shut down
+            strategy_results_dict.close()
+            raise
+
+        for future in futures:
+            tracing.merge(future.result())    # surfaces any worker errors
+
+    num_unique = sum(1 for summary in strategy_summary_dict.values() if not summary['duplicate_of'])
+    print('Unique signals evaluated: {} of {} strategies ({:.1%} deduplicated)\n'.format(
+        num_unique, len(strategy_summary_dict), 1 - num_unique / max(len(strategy_summary_dict), 1)))
+
+    # GENERATE REPORT
+    with tracing.span('report', mode=report_mode):
+        if streaming_report is not None:
+            streaming_report.finish()
+        elif report_mode == 'ranked':
+            report.generate_ranked_report(general_params, strategy_summary_dict, strategy_results_dict, rank_metric, report_top_k)
+        else:
+            report.generate_report(general_params, strategy_summary_dict, strategy_results_dict)
+    strategy_results_dict.close()    # clean up spilled results
 
-    
\ No newline at end of file
+    # TEST ROBUSTNESS
+    if robustness_paths > 0:
+        run_robustness(data_cache, strategies)
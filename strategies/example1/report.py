@@ -10,12 +10,28 @@
 # of key performance metrics.
 ###############################################################################
 import datetime
+import math
+import queue
+import threading
 import pandas as pd
 import numpy as np
 import matplotlib
+matplotlib.use('Agg')    # detail pages are plotted off the main thread, which only non-gui backends support
 import matplotlib.pyplot as plt
 from fpdf import FPDF
-from sklearn.datasets import load_iris
+
+from utils import compact
+from utils import reporting
+from utils import tracing
+
+
+# CONFIG
+output_directory = 'output/cci/'
+results_table_format = 'csv'    # 'csv' or 'parquet'
+table_width = 190    # mm, maximum total width of the summary table (page width less margins)
+max_column_width = 45    # mm, longer summary table values are truncated
+cell_padding = 2    # mm, horizontal space left around summary table text
+table_keys = ['name', 'lookback', 'threshold', 'num_triggers', 'final_btc_balance']    # summary fields shown, in table header order
 
 
 # CLASSES
@@ -41,15 +57,122 @@ class PDF(FPDF):
         # Page number
         self.cell(0, 10, 'Page ' + str(self.page_no()) + '/{nb}', 0, 0, 'C')
 
+    def goto_page(self, page, y=None):
+        """ Moves output back to an already created page so it can be filled in after later
+        pages have been written. The current font is forgotten so the next set_font() call is
+        always written out to that page. """
+        self.page = page
+        self.font_family = ''
+        self.set_xy(self.l_margin, self.t_margin if y is None else y)
+
+
+class StreamingReport:
+    """ Builds the report incrementally while strategies are still being run. Each strategy's
+    results are handed over with add() as soon as they are ready and its detailed page is
+    rendered on a background thread, after which the results frame is released. The summary
+    pages are reserved at the front of the report up front and filled in by finish(), once
+    every strategy's summary is known. At most "queue_size" results frames wait to be rendered
+    at any time, so memory stays at roughly one strategy's worth of data. """
+
+    def __init__(self, general_params, num_strategies, rank_metric=None, queue_size=1):
+        self.general_params = dict(general_params)
+        self.rank_metric = rank_metric
+        if rank_metric is not None:
+            self.general_params['rank_metric'] = rank_metric
+            self.general_params.setdefault('table_row_height', 6)
+        self.summaries = {}
+        self.error = None
+
+        # INITIALIZE REPORT AND RESERVE SUMMARY PAGES
+        self.pdf = PDF()
+        self.pdf.alias_nb_pages()
+        self.pdf.add_page()
+        self.content_y = self.pdf.get_y()    # first line below the page header
+        self.dedup_y = add_summary_header(self.pdf, self.general_params, num_strategies, dedup_line='')    # line filled in by finish()
+        self.table_y = self.pdf.get_y()
+        self.row_height = self.general_params.get('table_row_height', 10)
+        self.first_page_rows = int((self.pdf.page_break_trigger - self.table_y - 10) // self.row_height)
+        self.page_rows = int((self.pdf.page_break_trigger - self.content_y - 10) // self.row_height)
+        extra_rows = max(num_strategies + 1 - self.first_page_rows, 0)    # +1 leaves room for an overflow note
+        for _ in range(math.ceil(extra_rows / self.page_rows)):
+            self.pdf.add_page()
+        self.summary_pages = self.pdf.page
+
+        # START RENDER THREAD
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self._render, daemon=True)
+        self.thread.start()
+
+    def _render(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error is None:
+                try:
+                    add_detail_page(self.pdf, *item)
+                except Exception as e:
+                    self.error = e
+            del item    # release the results frame
+
+    def add(self, key, summary, results_df):
+        """ Queues the detailed page for a single strategy. Blocks while the render thread is
+        behind so finished results frames cannot pile up in memory. Strategies without a
+        results frame (duplicate signals) are only listed in the summary. """
+        if self.error is not None:
+            raise self.error
+        self.summaries[key] = summary
+        if results_df is not None:
+            self.queue.put((key, summary, results_df))
+
+    def finish(self):
+        """ Waits for the remaining detailed pages, fills in the reserved summary pages and
+        writes the report (plus results table) to the output directory. """
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+        if self.rank_metric is not None:
+            summaries = reporting.rank_strategies(self.summaries, self.rank_metric)
+        else:
+            summaries = list(self.summaries.items())
+
+        # FILL IN SUMMARY PAGES
+        last_page = self.pdf.page
+        dedup_line = signal_dedup_line(self.summaries)
+        if dedup_line is not None:
+            self.pdf.goto_page(1, self.dedup_y)
+            self.pdf.set_font('Times', '', 12)
+            self.pdf.cell(0, 10, dedup_line, 0, 1)
+        self.pdf.goto_page(1, self.table_y)
+        capacity = self.first_page_rows + (self.summary_pages - 1) * self.page_rows
+        if len(summaries) > capacity:
+            capacity -= 1    # keep the last row for the overflow note
+        next_page = iter(range(2, self.summary_pages + 1))
+        add_summary_table(self.pdf, self.general_params, summaries[:capacity], ranked=self.rank_metric is not None,
+                          new_page=lambda: self.pdf.goto_page(next(next_page), self.content_y))
+        if len(summaries) > capacity:
+            self.pdf.cell(0, self.row_height, '... {} more strategies listed in the results table'.format(len(summaries) - capacity), 0, 1)
+        self.pdf.goto_page(last_page)
+
+        # OUTPUT REPORT
+        date_string = str(datetime.datetime.today().strftime('%Y-%m-%d'))
+        with tracing.span('pdf_output'):
+            self.pdf.output(output_directory + 'CCI_Report_' + date_string + '.pdf', 'F')
+        reporting.write_results_table(summaries, output_directory + 'CCI_Results_' + date_string + '.' + results_table_format)
+
 
 # FUNCTIONS
+@tracing.traced('plot.btc_time_history')
 def generate_btc_time_history_plot(input_df, name):
     
     # Add traces
+    time = compact.to_datetime(input_df['UTC'])    # epoch seconds in compact mode
     fig, ax1 = plt.subplots()
-    ax1.plot(input_df['UTC'], input_df['Close'], color='orange')
+    ax1.plot(time, input_df['Close'], color='orange')
     ax2 = ax1.twinx()
-    ax2.plot(input_df['UTC'], input_df['rolling_btc_received'], color='black')
+    ax2.plot(time, input_df['rolling_btc_received'], color='black')
 
     # Format y axes
     ax1.set_ylabel('Close Price', color='orange')
@@ -68,18 +191,20 @@ def generate_btc_time_history_plot(input_df, name):
     plt.xlabel("Time (UTC)")
     # plt.legend()
 
-    plt.savefig('output/cci/' + name + '_btc_time_history_plot.png')
+    plt.savefig(output_directory + name + '_btc_time_history_plot.png')
 
     return fig
 
 
+@tracing.traced('plot.cci_time_history')
 def generate_cci_time_history_plot(input_df, name, threshold):
     
     # Add traces
+    time = compact.to_datetime(input_df['UTC'])    # epoch seconds in compact mode
     fig, ax1 = plt.subplots()
-    ax1.plot(input_df['UTC'], input_df['Close'], color='orange')
+    ax1.plot(time, input_df['Close'], color='orange')
     ax2 = ax1.twinx()
-    ax2.plot(input_df['UTC'], input_df['cci'], color='cyan')
+    ax2.plot(time, input_df['cci'], color='cyan')
     ax2.axhline(y=threshold, color='r', linestyle='--')
 
     # Format y axes
@@ -99,19 +224,27 @@ def generate_cci_time_history_plot(input_df, name, threshold):
     plt.xlabel("Time (UTC)")
     # plt.legend()
 
-    plt.savefig('output/cci/' + name + '_cci_time_history_plot.png')
+    plt.savefig(output_directory + name + '_cci_time_history_plot.png')
 
     return fig
 
 
-def generate_report(general_params, strategy_summary_dict, strategy_results_dict):
-    
-    # INITIALIZE REPORT
-    pdf = PDF()
-    pdf.alias_nb_pages()
+def signal_dedup_line(strategy_summary_dict):
+    """ Returns the summary page line reporting how many strategies had a unique buy signal, or None if the run did
+    not deduplicate signals. """
+
+    summaries = list(strategy_summary_dict.values())
+    if not summaries or 'duplicate_of' not in summaries[0]:
+        return None
+
+    num_unique = sum(1 for summary in summaries if not summary['duplicate_of'])
+    return 'Unique Signals Evaluated:        {} of {} ({:.1%} deduplicated)'.format(num_unique, len(summaries), 1 - num_unique / len(summaries))
+
+
+def add_summary_header(pdf, general_params, num_strategies, dedup_line=None):
+    """ Adds the summary page title and general run info to the current page. Returns the y position of the signal
+    deduplication line (None if there is none) so it can be filled in later. """
 
-    # ADD SUMMARY PAGE
-    pdf.add_page()
     pdf.set_font('Times', '', 12)
     pdf.cell(60)
     pdf.cell(75, 10,'General Results Summary', 0, 2, 'C')    # page title
@@ -121,43 +254,165 @@ def generate_report(general_params, strategy_summary_dict, strategy_results_dict
     # General info listed
     pdf.cell(0, 10, 'Date of Run:       ' + str(datetime.datetime.utcnow()), 0, 1)
     pdf.cell(0, 10, 'Time History Covered:      ' + general_params['time_history'] + ' to Present', 0, 1)
-    pdf.cell(0, 10, 'Num. Strategies Tested:        ' + str(len(strategy_results_dict)), 0, 1)
+    pdf.cell(0, 10, 'Num. Strategies Tested:        ' + str(num_strategies), 0, 1)
     pdf.cell(0, 10, 'Dummy Portfolio Starting Capital (usd):        $' + str(general_params['starting_capital']), 0, 1)
     pdf.cell(0, 10, 'Bet Size (usd):        $' + str(general_params['bet']), 0, 1)
+    if 'rank_metric' in general_params:
+        pdf.cell(0, 10, 'Ranked By:        ' + general_params['rank_metric'], 0, 1)
+    dedup_y = None
+    if dedup_line is not None:
+        dedup_y = pdf.get_y()
+        pdf.cell(0, 10, dedup_line, 0, 1)
     pdf.cell(90, 10, '', 0, 2, 'C')
 
-    # Summary table
-    for header in general_params['table_headers'][:-1]:
-        pdf.cell(35, 10, header, 1, 0 , 'C')
-    pdf.cell(35, 10, general_params['table_headers'][-1], 1, 2, 'C')
-    pdf.cell(-140)
-    pdf.set_font('arial', '', 11)
-    for key, value in strategy_summary_dict.items():
-        pdf.cell(35, 10, str(value['name']), 1, 0, 'C')
-        pdf.cell(35, 10, str(value['lookback']), 1, 0, 'C')
-        pdf.cell(35, 10, str(value['threshold']), 1, 0, 'C')
-        pdf.cell(35, 10, str(value['num_triggers']), 1, 0, 'C')
-        pdf.cell(35, 10, str(value['final_btc_balance']), 1, 2, 'C')
-        pdf.cell(-140)
+    return dedup_y
+
+
+def fit_text(pdf, text, width):
+    """ Returns "text" truncated with '...' so it fits in a cell of "width" (mm) in the current font. """
+
+    if pdf.get_string_width(text) + cell_padding <= width:
+        return text
+    while text and pdf.get_string_width(text + '...') + cell_padding > width:
+        text = text[:-1]
+    return text + '...'
+
+
+def summary_column_widths(pdf, headers, keys, summaries, value_font_size, available_width):
+    """ Sizes each summary table column to its widest header or value, capped at max_column_width. If the columns
+    still do not fit in "available_width", the space values need beyond their header is shrunk first (so headers stay
+    readable) and fit_text() truncates the values that overflow. """
+
+    pdf.set_font('Times', '', 12)
+    header_widths = [pdf.get_string_width(header) + cell_padding for header in headers]
+    pdf.set_font('arial', '', value_font_size)
+    widths = list(header_widths)
+    for _, value in summaries:
+        widths = [max(width, pdf.get_string_width(str(value.get(k, ''))) + cell_padding) for width, k in zip(widths, keys)]
+    widths = [min(width, max(max_column_width, header_width)) for width, header_width in zip(widths, header_widths)]
+
+    if sum(widths) > available_width:
+        excess = sum(widths) - available_width
+        slack = sum(widths) - sum(header_widths)    # room to shrink before any header gets truncated
+        if excess <= slack:
+            widths = [width - (width - header_width) * excess / slack for width, header_width in zip(widths, header_widths)]
+        else:
+            widths = [header_width * available_width / sum(header_widths) for header_width in header_widths]
+
+    return widths
+
+
+def add_summary_table(pdf, general_params, summaries, ranked=False, new_page=None):
+    """ Adds the summary table for the input (key, summary) pairs, starting at the current
+    position. The table continues onto as many pages as needed, repeating the header row
+    at the top of each one. When "ranked" is set a leading rank column is added. Columns are
+    sized to their contents (see summary_column_widths()). """
+
+    new_page = new_page or pdf.add_page
+
+    headers = general_params['table_headers']
+    keys = general_params.get('table_keys', table_keys)
+    row_height = general_params.get('table_row_height', 10)
+    value_font_size = 11 if row_height >= 10 else 8
+    rank_width = 15 if ranked else 0
+    col_widths = summary_column_widths(pdf, headers, keys, summaries, value_font_size, table_width - rank_width)
+    left = pdf.l_margin
+
+    def add_header_row():
+        pdf.set_font('Times', '', 12)
+        pdf.set_x(left)
+        if ranked:
+            pdf.cell(rank_width, 10, 'Rank', 1, 0, 'C')
+        for header, col_width in zip(headers, col_widths):
+            pdf.cell(col_width, 10, fit_text(pdf, header, col_width), 1, 0, 'C')
+        pdf.ln(10)
+        pdf.set_font('arial', '', value_font_size)
+
+    add_header_row()
+    for rank, (key, value) in enumerate(summaries, start=1):
+        if pdf.get_y() + row_height > pdf.page_break_trigger:    # continue table on a new page
+            new_page()
+            add_header_row()
+        pdf.set_x(left)
+        if ranked:
+            pdf.cell(rank_width, row_height, str(rank), 1, 0, 'C')
+        for k, col_width in zip(keys, col_widths):
+            pdf.cell(col_width, row_height, fit_text(pdf, str(value.get(k, '')), col_width), 1, 0, 'C')
+        pdf.ln(row_height)
+
+
+def add_detail_page(pdf, key, summary, results_df):
+    """ Adds a detailed results page (description plus btc and cci time history plots) for
+    a single strategy. Figures are closed once embedded so memory does not build up over
+    long runs. """
+
+    pdf.add_page()
+    pdf.set_font('Times', '', 12)
+    pdf.cell(60)
+    pdf.cell(75, 10,'Detailed Results Summary: {}'.format(key), 0, 2, 'C')    # page title
+    # pdf.cell(-60)
+    pdf.cell(75, 10, 'Strategy Description: ' + summary['description'], 0, 1, 'C')
+
+    fig = generate_btc_time_history_plot(results_df, key)
+    plt.close(fig)
+    pdf.image(output_directory + key + '_btc_time_history_plot.png', x = 40, y = None, w = 0, h = 100, type = '', link = '')
+
+    fig = generate_cci_time_history_plot(results_df, key, summary['threshold'])
+    plt.close(fig)
+    pdf.image(output_directory + key + '_cci_time_history_plot.png', x = 40, y = None, w = 0, h = 100, type = '', link = '')
+
+
+def generate_report(general_params, strategy_summary_dict, strategy_results_dict):
+    
+    # INITIALIZE REPORT
+    pdf = PDF()
+    pdf.alias_nb_pages()
+
+    # ADD SUMMARY PAGE
+    pdf.add_page()
+    add_summary_header(pdf, general_params, len(strategy_summary_dict), signal_dedup_line(strategy_summary_dict))
+    add_summary_table(pdf, general_params, strategy_summary_dict.items())
 
     # ADD DETAILED PAGES
     for key, value in strategy_results_dict.items():
-        pdf.add_page()
-        pdf.set_font('Times', '', 12)
-        pdf.cell(60)
-        pdf.cell(75, 10,'Detailed Results Summary: {}'.format(key), 0, 2, 'C')    # page title
-        # pdf.cell(-60)
-        pdf.cell(75, 10, 'Strategy Description: ' + strategy_summary_dict[key]['description'], 0, 1, 'C')
+        add_detail_page(pdf, key, strategy_summary_dict[key], value)
+
+    # OUTPUT REPORT
+    with tracing.span('pdf_output'):
+        pdf.output(output_directory + 'CCI_Report_' + str(datetime.datetime.today().strftime('%Y-%m-%d')) + '.pdf', 'F')
+
 
-        generate_btc_time_history_plot(value, key)
-        pdf.image('output/cci/' + key + '_btc_time_history_plot.png', x = 40, y = None, w = 0, h = 100, type = '', link = '')
+def generate_ranked_report(general_params, strategy_summary_dict, strategy_results_dict, rank_metric='final_btc_balance', top_k=10):
+    """ Scalable version of generate_report() for large parameter sweeps. Every variant is
+    listed in a compact summary table ranked on "rank_metric", but detailed pages are only
+    added for the "top_k" best variants. A results table with one row per variant is written
+    alongside the pdf for further analysis. """
 
-        generate_cci_time_history_plot(value, key, strategy_summary_dict[key]['threshold'])
-        pdf.image('output/cci/' + key + '_cci_time_history_plot.png', x = 40, y = None, w = 0, h = 100, type = '', link = '')
+    # RANK RESULTS
+    ranked = reporting.rank_strategies(strategy_summary_dict, rank_metric)
+    unique = {key: value for key, value in strategy_summary_dict.items() if not value.get('duplicate_of')}    # duplicate signals have no detail page of their own
+    top = reporting.rank_strategies(unique, rank_metric, top_k=top_k)
+
+    # INITIALIZE REPORT
+    pdf = PDF()
+    pdf.alias_nb_pages()
+
+    # ADD SUMMARY PAGES
+    params = dict(general_params, rank_metric=rank_metric)
+    params.setdefault('table_row_height', 6)    # compact rows so large sweeps need fewer pages
+    pdf.add_page()
+    add_summary_header(pdf, params, len(strategy_summary_dict), signal_dedup_line(strategy_summary_dict))
+    add_summary_table(pdf, params, ranked, ranked=True)
 
+    # ADD DETAILED PAGES (TOP K ONLY)
+    for key, value in top:
+        add_detail_page(pdf, key, value, strategy_results_dict[key])
 
     # OUTPUT REPORT
-    pdf.output('output/cci/CCI_Report_' + str(datetime.datetime.today().strftime('%Y-%m-%d')) + '.pdf', 'F')
+    date_string = str(datetime.datetime.today().strftime('%Y-%m-%d'))
+    with tracing.span('pdf_output'):
+        pdf.output(output_directory + 'CCI_Report_' + date_string + '.pdf', 'F')
+    reporting.write_results_table(ranked, output_directory + 'CCI_Results_' + date_string + '.' + results_table_format)
 
 
 
@@ -1,39 +1,165 @@
 ###############################################################################
 # FILENAME: autoemail.py
 # PROJECT: EOC Offline Backtesting Tool
-# CLIENT: 
+# CLIENT:
 # AUTHOR: Matt Hartigan
 # DATE CREATED: 31 May 2022
 # DESCRIPTION: Utility file tha contains functions used to send email messages
 # via python.
 ###############################################################################
+import os
+import queue
 import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.application import MIMEApplication
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
 from config import config_params
 
 
-def send_email_with_attachment(subject, body, footer, attachment):
+# CONFIG
+default_smtp_host = 'smtp.gmail.com'
+default_smtp_port = 587
+default_max_connections = 2    # max number of smtp connections (and concurrent sends) per dispatcher
+undisclosed_recipients = 'undisclosed-recipients:;'    # To header, receivers only go in the smtp envelope so the list stays private
+
+
+# CLASSES
+class EmailDispatcher:
+    """ Sends emails asynchronously over a small pool of reused, authenticated SMTP connections.
+    Connections are opened lazily (at most "max_connections" of them) and kept open until
+    close() is called, so a whole batch of emails costs one STARTTLS/login per connection
+    instead of one per email. Server settings default to the project config file but can be
+    overridden, e.g. to point at a local SMTP stand-in without TLS or login. """
+
+    def __init__(self, host=None, port=None, sender=None, password=None, use_tls=True, max_connections=default_max_connections):
+        self.host = host or config_params.get('smtp_host', default_smtp_host)
+        self.port = port or config_params.get('smtp_port', default_smtp_port)
+        self.sender = sender or config_params['sender_email']
+        self.password = password if password is not None else config_params.get('2fapassword')
+        self.use_tls = use_tls
+        self.executor = ThreadPoolExecutor(max_workers=max_connections)    # bounds concurrent sends
+        self.connections = queue.LifoQueue()    # idle connections, most recently used first
+        self.open_connections = []
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.password:
+                server.login(self.sender, self.password)
+        except (smtplib.SMTPException, OSError):
+            server.close()
+            raise
+        with self.lock:
+            self.open_connections.append(server)
+        return server
+
+    def _discard(self, server):
+        """ Closes a connection that can no longer be used and drops it from the pool. """
+        with self.lock:
+            if server in self.open_connections:
+                self.open_connections.remove(server)
+        try:
+            server.close()
+        except OSError:
+            pass
+
+    def _release(self, server, failed=False):
+        """ Returns a connection to the idle pool. After a failed send the connection is reset
+        first and discarded if that fails too, so only usable connections are kept. """
+        if failed:
+            try:
+                server.rset()    # clear the half finished transaction
+            except (smtplib.SMTPException, OSError):
+                self._discard(server)
+                return
+        self.connections.put(server)
+
+    def _acquire(self):
+        try:
+            return self.connections.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _send(self, message, receivers):
+        server = self._acquire()
+        failed = True
+        try:
+            try:
+                server.sendmail(self.sender, receivers, message)
+            except smtplib.SMTPServerDisconnected:    # idle connection was dropped by the server, reconnect once
+                self._discard(server)
+                server = None
+                server = self._connect()
+                server.sendmail(self.sender, receivers, message)
+            failed = False
+        finally:    # every checked out connection goes back to the pool or is closed, even when sending fails
+            if server is not None:
+                self._release(server, failed)
 
-    # Authenticate
-    server = smtplib.SMTP('smtp.gmail.com', 587)
-    server.starttls()
-    server.login(config_params['sender_email'], config_params['2fapassword'])
+    def send(self, message, receivers=None):
+        """ Queues an already built message (see build_message()) for delivery to every
+        receiver in a single SMTP transaction. Returns a future that raises if delivery fails. """
+        receivers = receivers or config_params['receiver_email_list']
+        return self.executor.submit(self._send, message, receivers)
+
+    def close(self):
+        """ Waits for queued emails to finish sending, then shuts down every open connection. """
+        self.executor.shutdown(wait=True)
+        for server in self.open_connections:
+            try:
+                server.quit()
+            except smtplib.SMTPException:
+                server.close()
+        self.open_connections = []
+
+
+# FUNCTIONS
+def build_message(subject, body, footer, attachment_path=None, sender=None):
+    """ Builds and encodes the email once for every receiver, optionally attaching the file at
+    "attachment_path". Returns the encoded message, ready to hand to EmailDispatcher.send().
+    Receivers are only given to the SMTP envelope on send, so they never see each other. """
+
+    sender = sender or config_params['sender_email']
+
+    message = MIMEMultipart()
+    message['From'] = sender
+    message['To'] = undisclosed_recipients
+    message['Subject'] = subject
+    message.attach(MIMEText(body + footer, 'plain'))
+
+    if attachment_path is not None:
+        with open(attachment_path, 'rb') as f:    # read attachment in binary
+            payload = MIMEApplication(f.read(), Name=os.path.basename(attachment_path))    # base 64 encoded
+        payload.add_header('Content-Disposition', 'attachment', filename=os.path.basename(attachment_path))
+        message.attach(payload)
+
+    return message.as_string()
+
+
+def send_email_with_attachment(subject, body, footer, attachment):
+    """ Sends a single email with the input MIME attachment to every receiver in the config
+    file. Kept for one-off sends, batches should share one EmailDispatcher instead. """
 
     # Build message
-    for receiver in config_params['receiver_email_list']:
-        message = MIMEMultipart()
-        message['From'] = config_params['sender_email']
-        message['To'] = receiver
-        message['Subject'] = subject
-        message.attach(MIMEText(body + footer, 'plain'))
-        message.attach(attachment)
-
-        print(receiver)
-        text = message.as_string()
-        server.sendmail(config_params['sender_email'], receiver, text)
-    #     server.sendmail(config_params['sender_email'], receiver, message + config_params['tagline'])
-
-    # Shutdown
-    server.quit()
+    message = MIMEMultipart()
+    message['From'] = config_params['sender_email']
+    message['To'] = undisclosed_recipients
+    message['Subject'] = subject
+    message.attach(MIMEText(body + footer, 'plain'))
+    message.attach(attachment)
+
+    # Send and shutdown
+    with EmailDispatcher(max_connections=1) as dispatcher:
+        dispatcher.send(message.as_string()).result()
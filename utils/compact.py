@@ -0,0 +1,100 @@
+###############################################################################
+# FILENAME: compact.py
+# PROJECT: EOC Offline Backtesting Tool
+# CLIENT:
+# AUTHOR: Matt Hartigan
+# DATE CREATED: 19 Oct 2026
+# DESCRIPTION: Opt-in compact execution mode. Converts the cleaned OHLCV frame
+# to float32 prices/volume and int64 epoch second timestamps (instead of
+# datetime objects), and each strategy's string action signal to a
+# categorical. Indicator outputs keep the precision of their input prices, so
+# they are float32 as well in compact mode. On hourly data this cuts an
+# evaluated results frame (what sweeps keep per strategy) by roughly 60% and
+# the input frame by about a third; integer columns (Unix, capital invested)
+# are left as they are.
+#
+# PRECISION: float32 carries ~7 significant digits (machine epsilon ~1.2e-7).
+# Measured against float64 on synthetic hourly BTC-like data (prices ~1e4,
+# windows 14 to 200) the largest indicator error is ~2e-5 of the output's own
+# scale (CCI at short windows, < 0.01 CCI points on values of a few hundred)
+# and most outputs stay under 1e-6, e.g. < 0.001 usd on sma/vwap prices of
+# ~1e4. The bounds below (max abs error
+# relative to the largest abs float64 value of each output) leave margin on
+# top of that and are checked by:
+#   python -m benchmarks.benchmark --precision
+# Cumulative sums (e.g. rolling_btc_received) drift with history length, at
+# roughly sqrt(n) * 1e-7 relative, so ~1e-4 at 10^6 bars. Signals that compare
+# an indicator against a threshold can flip on bars where the float64 value is
+# within that error of the threshold.
+###############################################################################
+import numpy as np
+import pandas as pd
+
+
+# CONFIG
+compact_dtype = np.float32
+price_labels = ['Open', 'High', 'Low', 'Close', 'Volume']
+signal_labels = ['action']    # string signal columns stored as categoricals
+default_precision_bound = 1e-4    # max abs error / max abs float64 value, per output column
+precision_bounds = {    # per function overrides of the default bound
+    'performance.sum_btc_accumulated': 1e-3,    # cumulative sum, drifts with history length
+}
+
+
+# FUNCTIONS
+def compact_ohlcv(input_df, time_label='UTC'):
+    """ Returns a compact copy of a cleaned OHLCV data frame: price and volume columns as
+    float32 and the time column as int64 epoch seconds. Other columns are left as they are. """
+
+    df = input_df.copy()
+
+    for label in price_labels:
+        if label in df.columns:
+            df[label] = df[label].astype(compact_dtype)
+
+    if not pd.api.types.is_integer_dtype(df[time_label]):
+        df[time_label] = pd.to_datetime(df[time_label]).to_numpy().astype('datetime64[s]').astype(np.int64)
+
+    return df
+
+
+def compact_signals(input_df):
+    """ Stores the string signal columns of a strategy's output (e.g. 'Buy' / 'No Action') as
+    categoricals, a byte per bar instead of a python string. Comparisons like
+    df['action'] == 'Buy' work unchanged. Modifies and returns the input frame. """
+
+    for label in signal_labels:
+        if label in input_df.columns:
+            input_df[label] = input_df[label].astype('category')
+
+    return input_df
+
+
+def is_compact(input_df, label='Close'):
+    return input_df[label].dtype == compact_dtype
+
+
+def to_datetime(values):
+    """ Converts a time column back to datetimes for display (e.g. plot axes); int64 epoch
+    second columns from compact mode are converted, datetime columns are returned as is. """
+
+    if pd.api.types.is_integer_dtype(values):
+        return pd.to_datetime(np.asarray(values), unit='s')
+    return values
+
+
+def precision_error(reference, compact):
+    """ Returns (max abs error relative to the largest abs reference value, number of bars
+    where only one of the two is NaN) between a float64 reference output and its compact
+    mode counterpart. """
+
+    reference = np.asarray(reference, dtype=np.float64)
+    compact = np.asarray(compact, dtype=np.float64)
+
+    finite = np.isfinite(reference) & np.isfinite(compact)
+    nan_mismatch = int((np.isfinite(reference) != np.isfinite(compact)).sum())
+    if not finite.any():
+        return 0.0, nan_mismatch
+
+    scale = max(np.abs(reference[finite]).max(), np.finfo(np.float64).tiny)
+    return float(np.abs(reference[finite] - compact[finite]).max() / scale), nan_mismatch
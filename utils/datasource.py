@@ -0,0 +1,221 @@
+###############################################################################
+# FILENAME: datasource.py
+# PROJECT: EOC Offline Backtesting Tool
+# CLIENT:
+# AUTHOR: Matt Hartigan
+# DATE CREATED: 19 Oct 2026
+# DESCRIPTION: Pluggable data source layer. Raw OHLCV csv files ("blobs") are
+# read from an object store (Google Cloud Storage, or a local directory that
+# stands in for a bucket) and synced incrementally into a local store that is
+# partitioned by month. A manifest per symbol records the partitions, the last
+# stored timestamp and the blobs already synced, so each sync only reads new
+# or changed blobs and only appends bars newer than what is already stored.
+# A blob that only grew since the last sync (e.g. a feed kept as one growing
+# csv) is read from the byte offset reached last time, so the cost of a sync
+# stays proportional to the new data. Only complete lines are synced, a row
+# still being written is picked up by the next sync. The manifest is the commit point: bytes
+# appended to a partition after the last manifest write (e.g. by a sync that
+# crashed) are ignored on load and cut off by the next sync.
+###############################################################################
+import io
+import os
+import json
+import datetime
+import pandas as pd
+
+
+# CONFIG
+raw_columns = ["Open", "High", "Low", "Close", "Volume", "Unix", "UTC"]    # column order of the raw data feed
+blob_tail_bytes = 64    # bytes before a blob's synced offset re-read to check the blob was only appended to
+
+
+# CLASSES
+class LocalObjectStore:
+    """ Object store stand-in backed by a local directory, with the same blob interface as
+    GCSObjectStore. Blob names are paths relative to the root directory, e.g.
+    'BTCUSD/2024-01-01.csv'. """
+
+    def __init__(self, root):
+        self.root = root
+
+    def list_blobs(self, prefix=''):
+        """ Returns {blob name: generation} for every blob under "prefix". The generation
+        changes whenever a blob is rewritten, so changed blobs can be re-synced. """
+        blobs = {}
+        for directory, _, files in os.walk(os.path.join(self.root, prefix)):
+            for file_name in files:
+                path = os.path.join(directory, file_name)
+                stat = os.stat(path)
+                blobs[os.path.relpath(path, self.root).replace(os.sep, '/')] = '{}-{}'.format(stat.st_size, stat.st_mtime_ns)
+        return dict(sorted(blobs.items()))
+
+    def read_blob(self, name, start=0):
+        with open(os.path.join(self.root, name), 'rb') as f:
+            f.seek(start)
+            return f.read()
+
+    def write_blob(self, name, data):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+
+class GCSObjectStore:
+    """ Google Cloud Storage bucket with the same blob interface as LocalObjectStore. The
+    google-cloud-storage package is only imported when this store is created. """
+
+    def __init__(self, bucket_name, credentials_path=None):
+        from google.cloud import storage
+
+        if credentials_path:
+            client = storage.Client.from_service_account_json(credentials_path)
+        else:
+            client = storage.Client()    # default credentials
+        self.bucket = client.bucket(bucket_name)
+
+    def list_blobs(self, prefix=''):
+        return {blob.name: str(blob.generation) for blob in sorted(self.bucket.list_blobs(prefix=prefix), key=lambda b: b.name)}
+
+    def read_blob(self, name, start=0):
+        blob = self.bucket.get_blob(name)
+        if start >= blob.size:    # e.g. the blob was rewritten shorter
+            return b''
+        return blob.download_as_bytes(start=start or None)
+
+    def write_blob(self, name, data):
+        self.bucket.blob(name).upload_from_string(data)
+
+
+class PartitionedStore:
+    """ Local store of raw OHLCV bars, one directory per symbol with one csv partition per
+    month ('2024-01.csv', ...) plus a manifest.json describing them. New bars are appended
+    to the partitions they fall in, so updates cost time proportional to the new data. """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _manifest_path(self, symbol):
+        return os.path.join(self.root, symbol, 'manifest.json')
+
+    def read_manifest(self, symbol):
+        if not os.path.exists(self._manifest_path(symbol)):
+            return {'symbol': symbol, 'last_timestamp': None, 'partitions': {}, 'blobs': {}}
+        with open(self._manifest_path(symbol)) as f:
+            return json.load(f)
+
+    def write_manifest(self, symbol, manifest):
+        manifest['updated'] = str(datetime.datetime.utcnow())
+        temp_path = self._manifest_path(symbol) + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, self._manifest_path(symbol))    # never leave a half written manifest behind
+
+    def append(self, symbol, df, manifest):
+        """ Appends the input bars (raw columns, sorted by time) to their monthly partitions
+        and updates the input manifest to match. The manifest is not written here. Anything
+        past the size a partition had in the manifest (left by a sync that crashed before its
+        manifest was written) is cut off first, so no bar is ever stored twice. """
+
+        os.makedirs(os.path.join(self.root, symbol), exist_ok=True)
+        for partition, rows in df.groupby(df['UTC'].str[:7], sort=True):    # 'YYYY-MM'
+            path = os.path.join(self.root, symbol, partition + '.csv')
+            info = manifest['partitions'].setdefault(partition, {'rows': 0, 'bytes': 0, 'first_timestamp': int(rows['Unix'].iloc[0])})
+            if os.path.exists(path) and 'bytes' in info:
+                os.truncate(path, info['bytes'])    # drop uncommitted rows
+            rows.to_csv(path, mode='a', header=info['rows'] == 0, index=False)
+
+            info['rows'] += len(rows)
+            info['bytes'] = os.path.getsize(path)
+            info['last_timestamp'] = int(rows['Unix'].iloc[-1])
+
+        if len(df):
+            manifest['last_timestamp'] = int(df['Unix'].iloc[-1])
+
+    def load(self, symbol, since=None):
+        """ Returns every stored bar for "symbol" as a raw data frame, reading only the monthly
+        partitions on or after the "since" date string (e.g. '2020-01-01') if given. Only the
+        bytes recorded in the manifest are read from each partition. """
+
+        manifest = self.read_manifest(symbol)
+        partitions = [p for p in sorted(manifest['partitions']) if since is None or p >= since[:7]]
+        if not partitions:
+            return pd.DataFrame(columns=raw_columns)
+
+        frames = []
+        for partition in partitions:
+            with open(os.path.join(self.root, symbol, partition + '.csv'), 'rb') as f:
+                data = f.read(manifest['partitions'][partition].get('bytes', -1))    # committed rows only
+            frames.append(pd.read_csv(io.BytesIO(data)))
+
+        return pd.concat(frames, ignore_index=True)
+
+
+# FUNCTIONS
+def read_raw_bars(data, header=True):
+    """ Parses a raw data feed csv blob into a data frame with the standard raw columns. Pass
+    header=False for a chunk read from the middle of a blob. """
+
+    if not data.strip():
+        return pd.DataFrame(columns=raw_columns)
+    if not header:
+        return pd.read_csv(io.BytesIO(data), header=None, names=raw_columns)
+
+    df = pd.read_csv(io.BytesIO(data))
+    df.columns = raw_columns    # rename columns
+    return df
+
+
+def read_new_bars(object_store, name, state):
+    """ Reads the bars added to blob "name" since it was last synced. "state" is the blob's
+    manifest entry from the last sync (empty if never synced). If the bytes just before the
+    synced offset are unchanged the blob was only appended to, so only the bytes past the
+    offset are read; otherwise the blob was rewritten and is read in full. Only complete lines
+    are parsed, a partly written last line is left for the next sync. Returns the bars and the
+    blob's new manifest entry (generation is filled in by the caller). """
+
+    offset = state.get('offset', 0)
+    tail = bytes.fromhex(state.get('tail', ''))
+
+    data = object_store.read_blob(name, offset - len(tail)) if offset else b''
+    if offset and data[:len(tail)] == tail:    # only appended to since the last sync
+        end = max(data.rfind(b'\n') + 1, len(tail))    # end of the last complete line
+        df = read_raw_bars(data[len(tail):end], header=False)
+        size = offset - len(tail) + end
+    else:
+        data = object_store.read_blob(name)
+        end = data.rfind(b'\n') + 1
+        df = read_raw_bars(data[:end])
+        size = end
+
+    return df, {'offset': size, 'tail': data[:end][-blob_tail_bytes:].hex()}
+
+
+def sync(object_store, local_store, symbol):
+    """ Incrementally syncs a symbol's raw bars from "object_store" (blobs under '<symbol>/')
+    into "local_store". Blobs already synced at the same generation are skipped without being
+    read, blobs that only grew are read from where the last sync stopped, and only bars newer
+    than the last stored timestamp are appended. Returns the number of new bars stored. """
+
+    manifest = local_store.read_manifest(symbol)
+    blobs = object_store.list_blobs(symbol + '/')
+    states = {name: state if isinstance(state, dict) else {'generation': state} for name, state in manifest['blobs'].items()}
+    new_blobs = [name for name, generation in blobs.items() if states.get(name, {}).get('generation') != generation]
+    if not new_blobs:
+        return 0
+
+    frames = []
+    for name in new_blobs:
+        df, state = read_new_bars(object_store, name, states.get(name, {}))
+        frames.append(df)
+        states[name] = dict(state, generation=blobs[name])
+    df = pd.concat(frames, ignore_index=True)
+    if manifest['last_timestamp'] is not None:
+        df = df[df['Unix'] > manifest['last_timestamp']]    # only bars newer than what is stored
+    df = df.sort_values('Unix').drop_duplicates('Unix', keep='last')
+
+    local_store.append(symbol, df, manifest)
+    manifest['blobs'] = states
+    local_store.write_manifest(symbol, manifest)
+
+    return len(df)
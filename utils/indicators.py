@@ -13,8 +13,18 @@ import statistics
 import pandas as pd
 import numpy as np
 
+from utils import tracing
+
+
+def _match_precision(df, col_name, source_label):
+    """ Casts an indicator output column back to float32 when the input prices are float32
+    (compact mode), since pandas rolling operations always return float64. """
+    if df[source_label].dtype == np.float32:
+        df[col_name] = df[col_name].astype(np.float32)
+
 
 # GENERAL INDICATORS
+@tracing.traced()
 def bollinger_band(input_df, column_label, rolling_window, standard_deviation):
     """ Classic bollinger band width calculation. Takes an input pandas data 
     frame, computes the bollinger band width for the input column at the input
@@ -31,6 +41,7 @@ def bollinger_band(input_df, column_label, rolling_window, standard_deviation):
     df['bb_top'] = df['bb_mid'] + (standard_deviation * df['std'])    # create top band    
     df['bb_bot'] = df['bb_mid'] - (standard_deviation * df['std'])    # create bottom band
     df[col_name] = (df['bb_top'] - df['bb_bot']) / df['bb_mid']    # calculate (normalized) width
+    _match_precision(df, col_name, column_label)
 
     df.drop('std', axis=1, inplace=True)    # drop unnecessary columns from output
     df.drop('bb_mid', axis=1, inplace=True)    
@@ -40,6 +51,7 @@ def bollinger_band(input_df, column_label, rolling_window, standard_deviation):
     return df
 
 
+@tracing.traced()
 def roc(input_df, close_label, rolling_window):
     """ Classic rate of change calculation. 
     Formula for the input "rolling_window" lookback period:
@@ -62,6 +74,7 @@ def roc(input_df, close_label, rolling_window):
 
 
 # MOVING AVERAGES
+@tracing.traced()
 def sma(input_df, close_label, rolling_window):
     """ Classic simple moving average calculation. Takes an input pandas data frame,
     computes the simple average of the last "rolling_window" periods, then returns the
@@ -71,10 +84,12 @@ def sma(input_df, close_label, rolling_window):
 
     col_name = str(rolling_window) + ' _SMA'
     df[col_name] = df[close_label].rolling(rolling_window).mean()
+    _match_precision(df, col_name, close_label)
 
     return df
 
 
+@tracing.traced()
 def zlema(input_df, close_label, rolling_window):
     """ Zero Lag Exponential Moving Average. This is a variation of EMA which adds a momentum term to
     reduce lag in the average in order to track current prices more closely. 
@@ -89,20 +104,24 @@ def zlema(input_df, close_label, rolling_window):
 
     # calc ema
     df['ema'] = df[close_label].rolling(window=rolling_window, min_periods=rolling_window).mean()[:rolling_window+1]    # get regular sma to start
+    ema = df.columns.get_loc('ema')    # positional writes, chained assignment does not write through under copy-on-write
     for i, row in enumerate(df['ema'].iloc[rolling_window+1:]):    # calculate ema based on first cell with sma
-        df['ema'].iloc[i + rolling_window + 1] = ((df[close_label].iloc[i + rolling_window + 1] - df['ema'].iloc[i + rolling_window]) * smoothing_factor) + df['ema'].iloc[i + rolling_window]
+        df.iloc[i + rolling_window + 1, ema] = ((df[close_label].iloc[i + rolling_window + 1] - df['ema'].iloc[i + rolling_window]) * smoothing_factor) + df['ema'].iloc[i + rolling_window]
 
     # calc zlema
     col_name = str(rolling_window) + '__ZLEMA'
-    df[col_name] = None
-    df[col_name].iloc[lag - 1] = df[close_label].iloc[lag - 1]    # get close price of the lagged day to start the zlema column calc from
+    df[col_name] = np.nan
+    zlema_col = df.columns.get_loc(col_name)
+    df.iloc[lag - 1, zlema_col] = df[close_label].iloc[lag - 1]    # get close price of the lagged day to start the zlema column calc from
     for i, row in enumerate(df[col_name].iloc[lag:]):    
-        df[col_name].iloc[i + lag] = ((1- smoothing_factor) * df[col_name].iloc[i + lag - 1]) + smoothing_factor * (df[close_label].iloc[i + lag] + (df[close_label].iloc[i + lag] - df[close_label].iloc[i + lag - lag]))    # apply formula
+        df.iloc[i + lag, zlema_col] = ((1- smoothing_factor) * df[col_name].iloc[i + lag - 1]) + smoothing_factor * (df[close_label].iloc[i + lag] + (df[close_label].iloc[i + lag] - df[close_label].iloc[i + lag - lag]))    # apply formula
+    _match_precision(df, col_name, close_label)
 
     return df
 
 
 # MOMENTUM INDICATORS
+@tracing.traced()
 def momentum(input_df, close_label, rolling_window):
     """ Measures the speed of price changes in an asset which can indicate trend.
     Formula:
@@ -120,6 +139,7 @@ def momentum(input_df, close_label, rolling_window):
     return df
 
 
+@tracing.traced()
 def cci(input_df, high_label, low_label, close_label, rolling_window):
     """ Classic commodity channel index (CCI) indicator. CCI is a momentum based oscillator that
     is used to help assess whether an asset is overbought or oversold. This function takes an 
@@ -135,37 +155,42 @@ def cci(input_df, high_label, low_label, close_label, rolling_window):
 
     df = input_df.copy()    # make copy of input df
 
-    lambert_constant = 0.015
+    col_name = str(rolling_window) + '__CCI'
+    df[col_name] = cci_values(df[high_label].to_numpy(), df[low_label].to_numpy(), df[close_label].to_numpy(), rolling_window)
 
-    df['typical_price'] = (df[high_label] + df[low_label] + df[close_label]) / 3    # calculate typical price
-    df['typical_price_sma'] = df['typical_price'].rolling(rolling_window).mean()    # calculate typical price rolling sma
+    return df
 
-    for x in range(0, rolling_window):    # add a shifted typical price column for each sma period
-        col_name = 'tp_shift_' + str(x)
-        df[col_name] = df['typical_price'].shift(periods=x) 
-        df = df.copy()    # avoid fragmentation
 
-    df['mean_deviation'] = 0    # initialize mean_deviation col
-    for x in range(0, rolling_window):    # sum the abs difference between sma and prev [rolling window] typical prices
-        col_name = 'tp_shift_' + str(x)
-        df['mean_deviation'] = df['mean_deviation'] + abs(df['typical_price_sma'] - df[col_name])
+def cci_values(high, low, close, rolling_window):
+    """ Array version of cci() used for batched work, e.g. many simulated price paths at once.
+    Takes numpy arrays of high, low and close prices (1d, or 2d with one path per row) and
+    returns the rolling CCI along the last axis with the same shape, NaN until a full rolling
+    window is available. Mean deviation is summed one lag at a time so memory stays at a few
+    arrays the size of the input regardless of the rolling window. """
 
-    df['mean_deviation_adj'] = df['mean_deviation'] / rolling_window    # normalize by size of rolling window
+    lambert_constant = 0.015
 
-    col_name = str(rolling_window) + '__CCI'
-    df[col_name] = (df['typical_price'] - df['typical_price_sma']) / (lambert_constant * df['mean_deviation_adj'])    # calculate cci
+    typical_price = (high + low + close) / 3    # calculate typical price
+    result = np.full(typical_price.shape, np.nan, dtype=typical_price.dtype)
+    n = typical_price.shape[-1]
+    if n < rolling_window:
+        return result
 
-    df.drop('typical_price', axis=1, inplace=True)    # drop unnecessary columns from output
-    df.drop('typical_price_sma', axis=1, inplace=True)
-    df.drop('mean_deviation', axis=1, inplace=True)
-    df.drop('mean_deviation_adj', axis=1, inplace=True)
-    for x in range(0, rolling_window):    
-        col_name = 'tp_shift_' + str(x)
-        df.drop(col_name, axis=1, inplace=True) 
+    windows = np.lib.stride_tricks.sliding_window_view(typical_price, rolling_window, axis=-1)
+    typical_price_sma = windows.mean(axis=-1)    # calculate typical price rolling sma (no copy of the windows)
 
-    return df
+    mean_deviation = np.zeros_like(typical_price_sma)
+    for x in range(0, rolling_window):    # sum the abs difference between sma and prev [rolling window] typical prices
+        mean_deviation += np.abs(typical_price_sma - typical_price[..., rolling_window - 1 - x:n - x])
+    mean_deviation /= rolling_window    # normalize by size of rolling window
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result[..., rolling_window - 1:] = (typical_price[..., rolling_window - 1:] - typical_price_sma) / (lambert_constant * mean_deviation)    # calculate cci
+
+    return result
 
 
+@tracing.traced()
 def rsi(input_df, close_label, rolling_window):
     """ Classic Wilder's relative strength index (RSI) indicator. Measures the momentum of an asset by comparing
     how quickly people are bidding the price up or down. 30 is typically considered oversold, 70 is typically 
@@ -185,16 +210,18 @@ def rsi(input_df, close_label, rolling_window):
     df['avg_gain'] = df['gain'].rolling(window=rolling_window, min_periods=rolling_window).mean()[:rolling_window+1]    # get regular sma for gains
     df['avg_loss'] = df['loss'].rolling(window=rolling_window, min_periods=rolling_window).mean()[:rolling_window+1]    # get regular sma for losses
 
+    avg_gain, avg_loss = df.columns.get_loc('avg_gain'), df.columns.get_loc('avg_loss')    # positional writes, chained assignment does not write through under copy-on-write
     for i, row in enumerate(df['avg_gain'].iloc[rolling_window+1:]):    # calculate Wilder-method-specific moving averages
-        df['avg_gain'].iloc[i + rolling_window + 1] = (df['avg_gain'].iloc[i + rolling_window] * (rolling_window - 1) + df['gain'].iloc[i + rolling_window + 1]) / rolling_window
+        df.iloc[i + rolling_window + 1, avg_gain] = (df['avg_gain'].iloc[i + rolling_window] * (rolling_window - 1) + df['gain'].iloc[i + rolling_window + 1]) / rolling_window
 
     for i, row in enumerate(df['avg_loss'].iloc[rolling_window+1:]):    # calculate Wilder-method-specific moving averages
-        df['avg_loss'].iloc[i + rolling_window + 1] = (df['avg_loss'].iloc[i + rolling_window] * (rolling_window - 1) + df['loss'].iloc[i + rolling_window + 1]) / rolling_window
+        df.iloc[i + rolling_window + 1, avg_loss] = (df['avg_loss'].iloc[i + rolling_window] * (rolling_window - 1) + df['loss'].iloc[i + rolling_window + 1]) / rolling_window
 
     df['rs'] = df['avg_gain'] / df['avg_loss']    # calculate rs
 
     col_name = str(rolling_window) + ' _RSI'
     df[col_name] = 100 - (100 / (1 + df['rs']))    # calculate rsi
+    _match_precision(df, col_name, close_label)
 
     df.drop('previous_close', axis=1, inplace=True)    # drop unnecessary columns from output
     df.drop('change', axis=1, inplace=True)
@@ -207,6 +234,7 @@ def rsi(input_df, close_label, rolling_window):
     return df
 
 
+@tracing.traced()
 def money_flow_index(input_df, close_label, high_label, low_label, volume_label, rolling_window):
     """ Movement indicator that analyzes both time and price to measure trading pressure in either 
     direction. Also called volume-weighted rsi since it includes volume, unlike traditional rsi which
@@ -222,8 +250,8 @@ def money_flow_index(input_df, close_label, high_label, low_label, volume_label,
 
     df['change'] = df['typical_price'] - df['typical_price'].shift(periods=1)
     df['raw_money_flow'] = df[volume_label] * df['typical_price']
-    df['positive_flow'] = 0
-    df['negative_flow'] = 0
+    df['positive_flow'] = 0.0    # float columns, the flows assigned below are floats
+    df['negative_flow'] = 0.0
     df.loc[df['change'] >= 0, 'positive_flow'] = df['raw_money_flow']
     df.loc[df['change'] < 0, 'negative_flow'] = df['raw_money_flow']
     df['sum_positive_money_flows'] = df['positive_flow'].rolling(rolling_window).sum()    
@@ -232,6 +260,7 @@ def money_flow_index(input_df, close_label, high_label, low_label, volume_label,
 
     col_name = str(rolling_window) + '__MFI'   
     df[col_name] = 100 - (100 / (1 + df['money_flow_ratio']))
+    _match_precision(df, col_name, close_label)
 
     df.drop('typical_price', axis=1, inplace=True)    # drop unnecessary columns from output
     df.drop('change', axis=1, inplace=True)    
@@ -245,6 +274,7 @@ def money_flow_index(input_df, close_label, high_label, low_label, volume_label,
     return df
 
 
+@tracing.traced()
 def chande_momentum_oscillator(input_df, close_label, rolling_window):
     """ This is a momentum indicator that calculates the difference between recent gains and 
     recent losses to give a sense of relative strength or weakness of a market. These kinds
@@ -263,8 +293,8 @@ def chande_momentum_oscillator(input_df, close_label, rolling_window):
 
     # sum when closes are higher and when they are lower
     df['change'] = df[close_label] - df[close_label].shift(periods=1)
-    df['higher_closes'] = 0
-    df['lower_closes'] = 0
+    df['higher_closes'] = 0.0    # float columns, the changes assigned below are floats
+    df['lower_closes'] = 0.0
     df.loc[df['change'] >= 0, 'higher_closes'] = abs(df['change'])
     df.loc[df['change'] < 0, 'lower_closes'] = abs(df['change'])
     df['sum_higher_closes'] = df['higher_closes'].rolling(rolling_window).sum()    
@@ -273,6 +303,7 @@ def chande_momentum_oscillator(input_df, close_label, rolling_window):
     # calculate rolling metric
     col_name = str(rolling_window) + ' _CMO'   
     df[col_name] = ((df['sum_higher_closes'] - df['sum_lower_closes']) / (df['sum_higher_closes'] + df['sum_lower_closes'])) * 100
+    _match_precision(df, col_name, close_label)
 
     df.drop('change', axis=1, inplace=True)    # drop unnecessary columns from output
     df.drop('higher_closes', axis=1, inplace=True)    
@@ -284,6 +315,7 @@ def chande_momentum_oscillator(input_df, close_label, rolling_window):
 
 
 # VOLATILITY INDICATORS
+@tracing.traced()
 def annualized_historical_volatility(input_df, close_label, rolling_window):
     """ Annualized, historical, "close to close" volatility calculation. Other options are parkinson and garman klass vol.
     Note that this volatility calc assumes 365 periods (aka days) occur in a given financial year 
@@ -303,6 +335,7 @@ def annualized_historical_volatility(input_df, close_label, rolling_window):
     df['std'] = df['interday_returns'].rolling(rolling_window).std()    # calc standard dev
     col_name = str(rolling_window) + '__volatility'   
     df[col_name] = math.sqrt(annualized_factor) * df['std']    # annualize to get result
+    _match_precision(df, col_name, close_label)
 
     df.drop('std', axis=1, inplace=True)    # drop unnecessary columns from output
     df.drop('interday_returns', axis=1, inplace=True)    
@@ -311,6 +344,7 @@ def annualized_historical_volatility(input_df, close_label, rolling_window):
     return df
 
 
+@tracing.traced()
 def garman_klass_volatility(input_df, open_label, high_label, low_label, close_label, rolling_window):
     """ Another measure of volatility (e.g. close/close volatility, parkinson volatility, etc.)
     that looks to improve accuracy by taking into account information beyond just the close price.
@@ -333,6 +367,7 @@ def garman_klass_volatility(input_df, open_label, high_label, low_label, close_l
     col_name = str(rolling_window) + '__garman.klass'   
     df[col_name] = df['combined_terms'].rolling(rolling_window).mean()    # sum gk terms
     df[col_name] = np.sqrt(df[col_name])    # take sqrt
+    _match_precision(df, col_name, close_label)
 
     df.drop('ln(h/l)_squared', axis=1, inplace=True)    # drop unnecessary columns from output
     df.drop('ln(c/o)_squared', axis=1, inplace=True)    
@@ -342,6 +377,7 @@ def garman_klass_volatility(input_df, open_label, high_label, low_label, close_l
 
 
 # PRICE INDICATORS
+@tracing.traced()
 def vwap(input_df, close_label, high_label, low_label, volume_label, rolling_window):
     """ Classive volume weighted average price calculation.
     
@@ -359,6 +395,7 @@ def vwap(input_df, close_label, high_label, low_label, volume_label, rolling_win
     df['cumulative_volume'] = df[volume_label].rolling(rolling_window).sum()
     col_name = str(rolling_window) + '__VWAP'
     df[col_name] = df['volume_times_price'] / df['cumulative_volume']
+    _match_precision(df, col_name, close_label)
 
     df.drop('typical_price', axis=1, inplace=True)    # drop unnecessary columns from output
     df.drop('volume_times_price', axis=1, inplace=True)    
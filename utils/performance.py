@@ -9,10 +9,14 @@
 # the specified return value(s). All functions in the production version of 
 # this library have been QA'd.
 ###############################################################################
+import hashlib
 import pandas as pd
 import numpy as np
 
+from utils import tracing
 
+
+@tracing.traced()
 def sum_capital_invested(input_df, bet, price_label, action_label):
     """ Logs the input bet amount every time a "Buy" action occurs in the input action
     column. Then performs a cumulative sum on those bets to determine how much capital was
@@ -27,6 +31,7 @@ def sum_capital_invested(input_df, bet, price_label, action_label):
     return(df)
 
 
+@tracing.traced()
 def sum_btc_accumulated(input_df, bet, price_label, action_label):
     """ Logs the BTC received every time a "Buy" action occurs in the input action
     column. Then performs a cumulative sum on those BTC to determine how much was
@@ -41,6 +46,43 @@ def sum_btc_accumulated(input_df, bet, price_label, action_label):
     return(df)
 
 
+def signal_fingerprint(input_df, action_label):
+    """ Returns a short hash of the "Buy" signal in the input action column. Strategy variants
+    with the same fingerprint produce exactly the same trades over the same data, so their
+    performance only needs to be evaluated once. """
+
+    buy_signal = np.asarray(input_df[action_label] == 'Buy')
+    packed = np.packbits(buy_signal)    # 1 bit per bar
+    return hashlib.blake2b(packed.tobytes() + len(buy_signal).to_bytes(8, 'little'), digest_size=16).hexdigest()
+
+
+def capital_invested_values(buy_signal, bet):
+    """ Array version of sum_capital_invested() for batched work. Takes a boolean buy signal
+    (1d, or 2d with one path per row) and returns the rolling capital invested along the last
+    axis. """
+
+    return np.cumsum(np.where(buy_signal, bet, 0), axis=-1)
+
+
+def btc_accumulated_values(close, buy_signal, bet):
+    """ Array version of sum_btc_accumulated() for batched work. Takes close prices and a
+    boolean buy signal of the same shape (1d, or 2d with one path per row) and returns the
+    rolling btc received along the last axis. """
+
+    return np.cumsum(np.where(buy_signal, bet / close, 0), axis=-1)
+
+
+def max_drawdown_values(equity):
+    """ Largest peak to trough drop in the input equity curve(s) along the last axis, as a
+    fraction of the running peak (0.25 = 25% drawdown). """
+
+    peak = np.maximum.accumulate(equity, axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown = np.where(peak > 0, (peak - equity) / peak, 0)
+
+    return drawdown.max(axis=-1)
+
+
 # TODO:
 # SHARPE RATIO
 # SORTINO RATIO
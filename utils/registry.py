@@ -0,0 +1,143 @@
+###############################################################################
+# FILENAME: registry.py
+# PROJECT: EOC Offline Backtesting Tool
+# CLIENT:
+# AUTHOR: Matt Hartigan
+# DATE CREATED: 19 Oct 2026
+# DESCRIPTION: Metadata-only strategy registry. Reads each strategy's
+# attributes (the dict literal returned by its get_attributes(), resolved
+# against its CONFIG constants) straight from the source file without
+# importing it, so listing strategies or planning a run does not pay for
+# importing pandas, matplotlib, etc. Strategy modules are only imported once
+# they are actually applied.
+###############################################################################
+import os
+import ast
+import operator
+import warnings
+import importlib
+
+
+# CONFIG
+attributes_function = 'get_attributes'    # strategy function whose returned dict literal holds the attributes
+binary_operators = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+                    ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow}
+unary_operators = {ast.USub: operator.neg, ast.UAdd: operator.pos}
+
+
+# FUNCTIONS
+def evaluate_constant(node, constants):
+    """ Statically evaluates an expression node built from literals, names of module constants
+    already in "constants", arithmetic (e.g. 24 * 7) and lists, tuples and dicts of those.
+    Raises ValueError for anything that would need the module to be run. """
+
+    try:
+        if isinstance(node, ast.Name):
+            if node.id not in constants:
+                raise ValueError('name {!r} is not a module constant'.format(node.id))
+            return constants[node.id]
+        if isinstance(node, ast.BinOp) and type(node.op) in binary_operators:
+            return binary_operators[type(node.op)](evaluate_constant(node.left, constants), evaluate_constant(node.right, constants))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in unary_operators:
+            return unary_operators[type(node.op)](evaluate_constant(node.operand, constants))
+        if isinstance(node, ast.List):
+            return [evaluate_constant(element, constants) for element in node.elts]
+        if isinstance(node, ast.Tuple):
+            return tuple(evaluate_constant(element, constants) for element in node.elts)
+        if isinstance(node, ast.Dict) and None not in node.keys:
+            return {evaluate_constant(k, constants): evaluate_constant(v, constants) for k, v in zip(node.keys, node.values)}
+        return ast.literal_eval(node)
+    except (TypeError, ArithmeticError) as e:
+        raise ValueError(str(e))
+
+
+def _module_constants(tree):
+    constants = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            targets, value = node.targets, node.value
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets, value = [node.target], node.value
+        else:
+            continue
+
+        try:
+            literal = evaluate_constant(value, constants)
+        except ValueError:
+            continue
+
+        for target in targets:
+            if isinstance(target, ast.Name):
+                constants[target.id] = literal
+
+    return constants
+
+
+def _parse(file_path):
+    with open(file_path) as f:
+        return ast.parse(f.read(), filename=file_path)
+
+
+def read_module_constants(file_path):
+    """ Returns a dict of every module level constant in the input python file, i.e. every
+    top level "name = <value>" assignment whose value can be evaluated without running the
+    module (literals, arithmetic on literals and earlier constants, etc.). Anything else is
+    skipped. """
+
+    return _module_constants(_parse(file_path))
+
+
+def read_strategy_attributes(file_path):
+    """ Returns the attributes of the strategy in the input file without importing it, by
+    statically evaluating the dict literal returned by its get_attributes() function. Only
+    the keys of that dict are returned. Raises ValueError if there is no such dict literal or
+    if any of its values cannot be read statically. """
+
+    tree = _parse(file_path)
+    constants = _module_constants(tree)
+
+    functions = [node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name == attributes_function]
+    returns = [node for node in ast.walk(functions[0]) if isinstance(node, ast.Return)] if functions else []
+    if len(returns) != 1 or not isinstance(returns[0].value, ast.Dict) or None in returns[0].value.keys:
+        raise ValueError('{}: {}() does not return a single dict literal'.format(file_path, attributes_function))
+
+    attributes = {}
+    for key, value in zip(returns[0].value.keys, returns[0].value.values):
+        key = evaluate_constant(key, constants)
+        try:
+            attributes[key] = evaluate_constant(value, constants)
+        except ValueError as e:
+            raise ValueError('{}: attribute {!r} cannot be read statically ({})'.format(file_path, key, e))
+
+    return attributes
+
+
+def discover_strategies(strategy_path, run_list=None, package=None):
+    """ Finds the strategy files in "strategy_path" (only those in "run_list" if given) and
+    returns a dict keyed by file name with the import path of each strategy module and its
+    attributes, matching what the module's get_attributes() returns. Attributes are read
+    statically where possible; otherwise a warning is issued and the module is imported to
+    call get_attributes(). """
+
+    package = package or '.'.join(os.path.normpath(strategy_path).split(os.sep))
+
+    strategies = {}
+    for file_name in sorted(os.listdir(strategy_path)):
+        if not file_name.endswith('.py') or file_name.startswith('_'):
+            continue
+        if run_list is not None and file_name not in run_list:
+            continue
+
+        import_path = package + '.' + file_name[:-len('.py')]
+        try:
+            attributes = read_strategy_attributes(os.path.join(strategy_path, file_name))
+        except ValueError as e:
+            warnings.warn('{}, importing the module instead'.format(e))
+            attributes = getattr(importlib.import_module(import_path), attributes_function)()
+
+        strategies[file_name] = {
+            'import_path': import_path,
+            'attributes': attributes,
+        }
+
+    return strategies
@@ -0,0 +1,87 @@
+###############################################################################
+# FILENAME: reporting.py
+# PROJECT: EOC Offline Backtesting Tool
+# CLIENT:
+# AUTHOR: Matt Hartigan
+# DATE CREATED: 19 Oct 2026
+# DESCRIPTION: Strategy agnostic helpers for building results reports. Ranks
+# the strategy summaries on a chosen metric and writes them out as a compact,
+# machine readable results table to sit alongside the pdf report.
+###############################################################################
+import os
+import csv
+import heapq
+import math
+
+
+# FUNCTIONS
+def _metric_value(summary, metric):
+    """ Returns the metric as a float for ranking purposes. Missing or non-numeric
+    values are ranked last instead of raising. """
+
+    try:
+        value = float(summary[metric])
+    except (KeyError, TypeError, ValueError):
+        return -math.inf
+
+    if math.isnan(value):
+        return -math.inf
+
+    return value
+
+
+def rank_strategies(strategy_summary_dict, metric, top_k=None, ascending=False):
+    """ Ranks the entries of the input strategy summary dict on the input metric. If
+    "top_k" is given only the best k (key, summary) pairs are returned, selected with a
+    bounded heap so only k entries are ever held regardless of the number of variants.
+    Otherwise every entry is returned in ranked order. Ties keep their insertion order. """
+
+    sign = 1 if ascending else -1
+    ranked = (
+        (sign * _metric_value(summary, metric), i, key)
+        for i, (key, summary) in enumerate(strategy_summary_dict.items())
+    )
+
+    if top_k is None:
+        ordered = sorted(ranked)
+    else:
+        ordered = heapq.nsmallest(top_k, ranked)    # bounded heap of size top_k
+
+    return [(key, strategy_summary_dict[key]) for _, _, key in ordered]
+
+
+def write_results_table(ranked_summaries, output_path):
+    """ Writes the input ranked (key, summary) pairs out as a flat results table with one
+    row per strategy variant. A ".parquet" output path is written as parquet when pandas and
+    a parquet engine are available, falling back to csv otherwise. Returns the path that
+    was written. """
+
+    columns = ['rank', 'key']    # union of summary fields, in first seen order
+    for key, summary in ranked_summaries:
+        for field in summary:
+            if field not in columns:
+                columns.append(field)
+
+    rows = []
+    for rank, (key, summary) in enumerate(ranked_summaries, start=1):
+        row = {'rank': rank, 'key': key}
+        row.update(summary)
+        rows.append(row)
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+
+    if output_path.endswith('.parquet'):
+        try:
+            import pandas as pd
+            pd.DataFrame(rows, columns=columns).to_parquet(output_path, index=False)
+            return output_path
+        except ImportError:
+            output_path = output_path[:-len('.parquet')] + '.csv'
+            print('No parquet engine available, writing results table as csv instead: {}'.format(output_path))
+
+    with open(output_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+    return output_path
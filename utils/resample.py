@@ -0,0 +1,106 @@
+###############################################################################
+# FILENAME: resample.py
+# PROJECT: EOC Offline Backtesting Tool
+# CLIENT:
+# AUTHOR: Matt Hartigan
+# DATE CREATED: 19 Oct 2026
+# DESCRIPTION: Vectorized OHLCV resampling (e.g. 1h bars to 4h or 1d bars)
+# plus a cache of the resampled frames so each (symbol, timeframe) pair is
+# only built once per run, optionally persisted to disk between runs.
+###############################################################################
+import os
+import numpy as np
+import pandas as pd
+
+
+# CONFIG
+timeframe_units = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}    # seconds per unit
+
+
+# FUNCTIONS
+def timeframe_seconds(timeframe):
+    """ Converts a timeframe string like '15m', '4h' or '1d' into its length in seconds. """
+
+    try:
+        return int(timeframe[:-1]) * timeframe_units[timeframe[-1].lower()]
+    except (KeyError, ValueError):
+        raise ValueError('Unrecognized timeframe: {} (expected e.g. 15m, 4h, 1d, 1w)'.format(timeframe))
+
+
+def resample_ohlcv(input_df, timeframe, time_label='UTC'):
+    """ Resamples a time sorted OHLCV data frame (Open, High, Low, Close, Volume columns plus
+    a datetime or int64 epoch second column) into bars of the input timeframe, aligned to the
+    unix epoch. Price and time column dtypes are kept, so compact frames stay compact. Bars are
+    built in one pass with numpy reductions over each bucket: first open, max high, min low,
+    last close and summed volume. Returns a new frame with the same columns as the cleaned data
+    feed (Open, High, Low, Close, Volume, Unix, UTC). """
+
+    seconds = timeframe_seconds(timeframe)
+
+    unix = input_df[time_label].to_numpy().astype('datetime64[s]').astype(np.int64)    # bar open times in seconds
+    bucket = unix // seconds
+    starts = np.flatnonzero(np.concatenate(([True], bucket[1:] != bucket[:-1])))    # first row of every bucket
+    ends = np.concatenate((starts[1:], [len(bucket)])) - 1    # last row of every bucket
+
+    df = pd.DataFrame({
+        'Open': input_df['Open'].to_numpy()[starts],
+        'High': np.maximum.reduceat(input_df['High'].to_numpy(), starts),
+        'Low': np.minimum.reduceat(input_df['Low'].to_numpy(), starts),
+        'Close': input_df['Close'].to_numpy()[ends],
+        'Volume': np.add.reduceat(input_df['Volume'].to_numpy(), starts),
+        'Unix': bucket[starts] * seconds,
+    })
+    if pd.api.types.is_integer_dtype(input_df[time_label]):
+        df['UTC'] = df['Unix']    # compact mode, keep epoch second timestamps
+    else:
+        df['UTC'] = pd.to_datetime(df['Unix'], unit='s')
+
+    return df
+
+
+# CLASSES
+class ResampleCache:
+    """ Holds the base timeframe data for each symbol and hands out resampled frames on
+    request. Each (symbol, timeframe) pair is resampled once, from the coarsest already cached
+    timeframe that divides it evenly (e.g. 1d from 4h rather than from 1h). If a cache
+    directory is given, resampled frames are also pickled there and reused by later runs as
+    long as the base data has not changed. """
+
+    def __init__(self, base_timeframe, cache_directory=None):
+        self.base_timeframe = base_timeframe
+        self.cache_directory = cache_directory
+        self.frames = {}    # (symbol, timeframe) -> frame
+        self.fingerprints = {}    # symbol -> summary of the base data, used to validate disk cache entries
+
+    def add_base(self, symbol, df):
+        """ Registers the base timeframe data for a symbol. """
+        self.frames[(symbol, self.base_timeframe)] = df
+        unix = df['UTC'].to_numpy().astype('datetime64[s]').astype(np.int64)
+        self.fingerprints[symbol] = '{}_{}_{}_{}'.format(len(df), unix[0] if len(df) else 0, unix[-1] if len(df) else 0, df['Close'].dtype)    # dtype keeps compact and float64 entries apart
+
+    def _disk_path(self, symbol, timeframe):
+        return os.path.join(self.cache_directory, '{}_{}_{}.pkl'.format(symbol, timeframe, self.fingerprints[symbol]))
+
+    def get(self, symbol, timeframe):
+        """ Returns the data for "symbol" at "timeframe", resampling (and caching) it if needed. """
+
+        if (symbol, timeframe) in self.frames:
+            return self.frames[(symbol, timeframe)]
+        if (symbol, self.base_timeframe) not in self.frames:
+            raise KeyError('No base data loaded for {}'.format(symbol))
+
+        if self.cache_directory is not None and os.path.exists(self._disk_path(symbol, timeframe)):
+            df = pd.read_pickle(self._disk_path(symbol, timeframe))
+        else:
+            target = timeframe_seconds(timeframe)
+            sources = [tf for (s, tf) in self.frames if s == symbol and target % timeframe_seconds(tf) == 0]
+            if not sources:
+                raise ValueError('Cannot build {} bars from {} base data'.format(timeframe, self.base_timeframe))
+            source = max(sources, key=timeframe_seconds)    # coarsest cached timeframe that divides the target
+            df = resample_ohlcv(self.frames[(symbol, source)], timeframe)
+            if self.cache_directory is not None:
+                os.makedirs(self.cache_directory, exist_ok=True)
+                df.to_pickle(self._disk_path(symbol, timeframe))
+
+        self.frames[(symbol, timeframe)] = df
+        return df
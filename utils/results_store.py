@@ -0,0 +1,182 @@
+###############################################################################
+# FILENAME: results_store.py
+# PROJECT: EOC Offline Backtesting Tool
+# CLIENT:
+# AUTHOR: Matt Hartigan
+# DATE CREATED: 19 Oct 2026
+# DESCRIPTION: Bounded-memory store for per-strategy results data frames.
+# Behaves like the plain dict it replaces, but once the frames held in memory
+# exceed the configured budget the oldest ones are spilled to local disk, one
+# .npy file per column, and read back lazily (memory-mapped, one column at a
+# time) when they are needed for metrics or plotting.
+###############################################################################
+import os
+import json
+import shutil
+import tempfile
+import collections
+import collections.abc
+import numpy as np
+import pandas as pd
+
+
+# CLASSES
+class SpilledFrame:
+    """ Read-only, column-lazy view of a results data frame that was spilled to disk. Indexing
+    with a column name returns a pandas Series backed by a memory-mapped file, so only the
+    columns actually used are ever read. Use to_frame() to load every column. """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.columns = pd.Index([column['name'] for column in self.meta['columns']])
+        self._index = None
+
+    def __len__(self):
+        return self.meta['length']
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    @property
+    def index(self):
+        if self._index is None:
+            index = self.meta['index']
+            if index['type'] == 'range':
+                self._index = pd.RangeIndex(index['start'], index['stop'], index['step'])
+            else:
+                self._index = pd.Index(np.load(os.path.join(self.directory, 'index.npy'), mmap_mode='r'))
+        return self._index
+
+    def __getitem__(self, name):
+        position = self.columns.get_loc(name)
+        column = self.meta['columns'][position]
+        values = np.load(os.path.join(self.directory, '{}.npy'.format(position)), mmap_mode='r')
+        if column['categories'] is not None:    # stored as category codes
+            values = pd.Categorical.from_codes(values, column['categories'])
+        return pd.Series(values, index=self.index, name=name, copy=False)
+
+    def to_frame(self):
+        return pd.DataFrame({name: self[name] for name in self.columns}, index=self.index)
+
+
+class ResultsStore(collections.abc.MutableMapping):
+    """ Dict-like store of results data frames keyed by strategy with a memory budget. Frames
+    are kept in memory until their combined size passes "memory_budget_mb", after which the
+    oldest frames are written to "spill_directory" (a temporary directory by default) and
+    handed back as SpilledFrame views from then on. Call close() (or use as a context manager)
+    to delete the spilled files. """
+
+    def __init__(self, memory_budget_mb=2048, spill_directory=None):
+        self.memory_budget = int(memory_budget_mb * 2**20)
+        self.spill_directory = spill_directory
+        self._owns_directory = spill_directory is None
+        self._frames = collections.OrderedDict()    # in memory frames, oldest first
+        self._sizes = {}
+        self._spilled = {}    # key -> directory of spilled frame
+        self._spill_count = 0
+        self.memory_used = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self._frames) + len(self._spilled)
+
+    def __iter__(self):
+        yield from list(self._spilled)    # spilled frames are the oldest
+        yield from list(self._frames)
+
+    def __contains__(self, key):
+        return key in self._frames or key in self._spilled
+
+    def __getitem__(self, key):
+        if key in self._frames:
+            return self._frames[key]
+        if key in self._spilled:
+            return SpilledFrame(self._spilled[key])
+        raise KeyError(key)
+
+    def __setitem__(self, key, df):
+        if key in self:
+            del self[key]
+
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        self._frames[key] = df
+        self._sizes[key] = size
+        self.memory_used += size
+
+        while self.memory_used > self.memory_budget and self._frames:    # spill oldest frames until back under budget
+            self._spill(next(iter(self._frames)))
+
+    def __delitem__(self, key):
+        if key in self._frames:
+            del self._frames[key]
+            self.memory_used -= self._sizes.pop(key)
+        elif key in self._spilled:
+            shutil.rmtree(self._spilled.pop(key), ignore_errors=True)
+        else:
+            raise KeyError(key)
+
+    @property
+    def num_spilled(self):
+        return len(self._spilled)
+
+    def _spill(self, key):
+        """ Writes one in-memory frame out to disk column by column and releases it. Numeric,
+        boolean and datetime columns are saved as is, anything else (e.g. the "action" column)
+        is saved as category codes so it can still be memory-mapped. """
+
+        if self.spill_directory is None:
+            self.spill_directory = tempfile.mkdtemp(prefix='eoc_results_')
+        self._spill_count += 1
+        directory = os.path.join(self.spill_directory, str(self._spill_count) + '_' + ''.join(c if c.isalnum() else '_' for c in str(key)))
+        os.makedirs(directory, exist_ok=True)
+
+        df = self._frames.pop(key)
+        self.memory_used -= self._sizes.pop(key)
+
+        columns = []
+        for position, name in enumerate(df.columns):
+            series = df.iloc[:, position]
+            categories = None
+            if series.dtype.kind not in 'biufcmM':
+                try:
+                    series = pd.to_numeric(series)    # e.g. object columns of floats and Nones
+                except (TypeError, ValueError):
+                    pass
+            if series.dtype.kind in 'biufcmM':
+                values = series.to_numpy()
+            else:
+                categorical = pd.Categorical(series.astype(str))
+                values = categorical.codes
+                categories = [str(c) for c in categorical.categories]
+            np.save(os.path.join(directory, '{}.npy'.format(position)), values)
+            columns.append({'name': name, 'categories': categories})
+
+        if isinstance(df.index, pd.RangeIndex):
+            index = {'type': 'range', 'start': df.index.start, 'stop': df.index.stop, 'step': df.index.step}
+        else:
+            index = {'type': 'array'}
+            np.save(os.path.join(directory, 'index.npy'), df.index.to_numpy())
+
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump({'key': str(key), 'length': len(df), 'index': index, 'columns': columns}, f)
+
+        self._spilled[key] = directory
+
+    def close(self):
+        """ Drops every stored frame and deletes the spilled files. """
+        self._frames.clear()
+        self._sizes.clear()
+        self.memory_used = 0
+        for directory in self._spilled.values():
+            shutil.rmtree(directory, ignore_errors=True)
+        self._spilled.clear()
+        if self._owns_directory and self.spill_directory is not None:
+            shutil.rmtree(self.spill_directory, ignore_errors=True)
+            self.spill_directory = None
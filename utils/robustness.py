@@ -0,0 +1,109 @@
+###############################################################################
+# FILENAME: robustness.py
+# PROJECT: EOC Offline Backtesting Tool
+# CLIENT:
+# AUTHOR: Matt Hartigan
+# DATE CREATED: 19 Oct 2026
+# DESCRIPTION: Monte Carlo / block bootstrap robustness testing. Builds many
+# synthetic price paths from a loaded time history and evaluates strategy
+# variants on all of them at once using the array versions of the indicator
+# and performance functions, giving a distribution of outcomes instead of
+# the single result from the historical path.
+###############################################################################
+import math
+import numpy as np
+
+from utils import performance
+from utils import tracing
+
+
+# CONFIG
+default_percentiles = [5, 25, 50, 75, 95]
+
+
+# FUNCTIONS
+def block_bootstrap_paths(input_df, num_paths, path_length=None, block_size=24, seed=None):
+    """ Builds "num_paths" synthetic OHLC price paths from the input time history using a block
+    bootstrap: each path is stitched together from randomly chosen blocks of "block_size"
+    consecutive bars (which keeps short term autocorrelation and volatility clustering) and
+    starts at the close price of a randomly chosen date. Each bar's open, high and low are
+    rebuilt relative to its close so every bar keeps its original shape. Returns a dict of
+    (num_paths, path_length) arrays keyed by 'Open', 'High', 'Low' and 'Close', float32 if the
+    input prices are float32 (compact mode) and float64 otherwise. """
+
+    rng = np.random.default_rng(seed)
+
+    close = input_df['Close'].to_numpy(dtype=float)
+    log_return = np.log(close[1:] / close[:-1])    # close to close return of each bar
+    open_offset = np.log(input_df['Open'].to_numpy(dtype=float)[1:] / close[:-1])    # open relative to previous close
+    high_offset = np.log(input_df['High'].to_numpy(dtype=float)[1:] / close[1:])    # high relative to close
+    low_offset = np.log(input_df['Low'].to_numpy(dtype=float)[1:] / close[1:])    # low relative to close
+
+    num_bars = len(log_return)
+    path_length = path_length or num_bars
+    block_size = max(1, min(block_size, num_bars))
+    num_blocks = math.ceil(path_length / block_size)
+
+    block_starts = rng.integers(0, num_bars - block_size + 1, size=(num_paths, num_blocks))
+    bars = (block_starts[:, :, None] + np.arange(block_size)).reshape(num_paths, -1)[:, :path_length]    # history bar used for every simulated bar
+
+    start_price = close[rng.integers(0, len(close), size=num_paths)]    # random start dates
+    path_close = start_price[:, None] * np.exp(np.cumsum(log_return[bars], axis=1))
+    previous_close = np.concatenate((start_price[:, None], path_close[:, :-1]), axis=1)
+
+    dtype = input_df['Close'].dtype if input_df['Close'].dtype == np.float32 else np.float64    # compact inputs give float32 paths
+    return {
+        'Open': (previous_close * np.exp(open_offset[bars])).astype(dtype, copy=False),
+        'High': (path_close * np.exp(high_offset[bars])).astype(dtype, copy=False),
+        'Low': (path_close * np.exp(low_offset[bars])).astype(dtype, copy=False),
+        'Close': path_close.astype(dtype, copy=False),
+    }
+
+
+@tracing.traced()
+def run_bootstrap(input_df, variants, signal_function, bet, starting_capital, num_paths=1000, path_length=None, block_size=24, chunk_size=250, seed=None):
+    """ Evaluates every strategy variant on "num_paths" bootstrapped price paths. "variants"
+    maps a key to that variant's parameters and "signal_function(paths, params, cache)" returns
+    its boolean buy signal for a batch of paths; "cache" is shared by every variant within a
+    batch so indicator arrays can be computed once per parameter set. Paths are generated and
+    evaluated "chunk_size" at a time to bound memory. Returns a dict keyed like "variants" with
+    arrays of the final btc balance and max drawdown of the dummy portfolio (starting capital
+    less capital invested plus btc held) on every path. Drawdowns can exceed 100% when the bets
+    placed add up to more than the starting capital. """
+
+    rng = np.random.default_rng(seed)
+    outcomes = {key: {'final_btc_balance': [], 'max_drawdown': []} for key in variants}
+
+    for chunk_start in range(0, num_paths, chunk_size):
+        paths = block_bootstrap_paths(input_df, min(chunk_size, num_paths - chunk_start), path_length, block_size, rng)
+        cache = {}
+
+        for key, params in variants.items():
+            buy_signal = signal_function(paths, params, cache)
+            capital_invested = performance.capital_invested_values(buy_signal, bet)
+            btc_accumulated = performance.btc_accumulated_values(paths['Close'], buy_signal, bet)
+            equity = starting_capital - capital_invested + btc_accumulated * paths['Close']    # dummy portfolio value
+
+            outcomes[key]['final_btc_balance'].append(btc_accumulated[:, -1])
+            outcomes[key]['max_drawdown'].append(performance.max_drawdown_values(equity))
+
+        del paths, cache
+
+    return {key: {metric: np.concatenate(values) for metric, values in outcome.items()} for key, outcome in outcomes.items()}
+
+
+def summarize_distributions(outcomes, percentiles=default_percentiles):
+    """ Reduces the per-path outcomes from run_bootstrap() to summary statistics (mean, standard
+    deviation and the input percentiles of every metric) keyed like the input. """
+
+    summaries = {}
+    for key, outcome in outcomes.items():
+        summary = {'num_paths': len(next(iter(outcome.values())))}
+        for metric, values in outcome.items():
+            summary[metric + '_mean'] = round(float(np.mean(values)), 4)
+            summary[metric + '_std'] = round(float(np.std(values)), 4)
+            for percentile, value in zip(percentiles, np.percentile(values, percentiles)):
+                summary[metric + '_p' + str(percentile)] = round(float(value), 4)
+        summaries[key] = summary
+
+    return summaries
@@ -0,0 +1,184 @@
+###############################################################################
+# FILENAME: tracing.py
+# PROJECT: EOC Offline Backtesting Tool
+# CLIENT:
+# AUTHOR: Matt Hartigan
+# DATE CREATED: 19 Oct 2026
+# DESCRIPTION: Lightweight instrumentation for the backtest pipeline. Wrap a
+# stage in span('name') (or decorate a function with @traced()) to record its
+# wall time, cpu time and peak memory. Recorded spans can be exported as json
+# or as a Chrome trace (open in chrome://tracing or https://ui.perfetto.dev).
+# Tracing is off until enable() is called, so spans cost next to nothing in
+# normal runs. Peak memory tracking is opt-in (enable(memory=True)) since
+# tracemalloc slows traced runs down several times over, and it is only
+# measured for spans on the main thread: tracemalloc's peak is process-wide, so
+# spans on other threads would reset each other's peaks. Main thread peaks
+# still include whatever other threads allocate at the same time. Spans
+# recorded in worker processes are handed back to the parent with merge().
+###############################################################################
+import os
+import json
+import time
+import threading
+import functools
+import contextlib
+import tracemalloc
+
+
+# CONFIG
+enabled = False
+trace_memory = False    # peak memory per main thread span via tracemalloc (slows traced runs down several times)
+spans = []    # finished spans, in completion order
+_local = threading.local()    # per thread stack of open spans
+_lock = threading.Lock()
+
+
+# FUNCTIONS
+def enable(memory=False):
+    """ Turns tracing on and clears any previously recorded spans. Pass memory=True to also
+    track peak memory, which is the expensive part of tracing. """
+
+    global enabled, trace_memory
+    enabled = True
+    trace_memory = memory
+    spans.clear()
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    global enabled
+    enabled = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """ Records the wall time, cpu time (of the current thread) and peak traced memory of the
+    enclosed block under "name". Extra keyword arguments are stored with the span. Spans can
+    be nested; a parent's peak memory includes its children's. Peak memory is only recorded
+    for spans on the main thread. """
+
+    if not enabled:
+        yield
+        return
+
+    stack = _stack()
+    record = {
+        'name': name,
+        'attributes': attributes,
+        'process': os.getpid(),
+        'thread': threading.get_ident(),
+        'depth': len(stack),
+        'child_peak': 0,
+    }
+    memory = trace_memory and tracemalloc.is_tracing() and threading.current_thread() is threading.main_thread()
+    if memory:
+        start_memory = tracemalloc.get_traced_memory()[0]
+        if stack:    # fold the peak so far into the parent before resetting it for this span
+            stack[-1]['child_peak'] = max(stack[-1]['child_peak'], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    stack.append(record)
+
+    record['start'] = time.time()
+    start_wall = time.perf_counter()
+    start_cpu = time.thread_time()
+    try:
+        yield
+    finally:
+        record['wall_s'] = time.perf_counter() - start_wall
+        record['cpu_s'] = time.thread_time() - start_cpu
+        stack.pop()
+        if memory:
+            peak = max(tracemalloc.get_traced_memory()[1], record['child_peak'])
+            record['peak_mb'] = (peak - start_memory) / 2**20
+            if stack:
+                stack[-1]['child_peak'] = max(stack[-1]['child_peak'], peak)
+        del record['child_peak']
+        with _lock:
+            spans.append(record)
+
+
+def traced(name=None):
+    """ Decorator that wraps every call to the function in a span named after the function
+    (or "name" if given). """
+
+    def decorator(func):
+        span_name = name or func.__module__.split('.')[-1] + '.' + func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def merge(records):
+    """ Adds spans recorded in another process (e.g. a worker's "spans" list sent back with its
+    result) to this process's spans. Each span keeps the process and thread it ran on. """
+
+    with _lock:
+        spans.extend(records)
+
+
+def summarize():
+    """ Returns total wall time, cpu time, worst peak memory and call count per span name,
+    slowest first. """
+
+    totals = {}
+    for record in spans:
+        total = totals.setdefault(record['name'], {'name': record['name'], 'calls': 0, 'wall_s': 0, 'cpu_s': 0, 'peak_mb': 0})
+        total['calls'] += 1
+        total['wall_s'] += record['wall_s']
+        total['cpu_s'] += record['cpu_s']
+        total['peak_mb'] = max(total['peak_mb'], record.get('peak_mb', 0))
+
+    return sorted(totals.values(), key=lambda x: x['wall_s'], reverse=True)
+
+
+def export_json(path):
+    """ Writes every recorded span plus the per-name summary to a json file. """
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'spans': spans, 'summary': summarize()}, f, indent=2, default=str)
+
+
+def export_chrome_trace(path):
+    """ Writes the recorded spans in Chrome trace event format (complete "X" events, times in
+    microseconds). Spans merged from worker processes show up as separate processes. """
+
+    pid = os.getpid()
+    events = []
+    for process in sorted({record.get('process', pid) for record in spans}):    # label each process track
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': process, 'tid': 0,
+                       'args': {'name': 'main' if process == pid else 'worker {}'.format(process)}})
+    for record in spans:
+        args = dict(record['attributes'], cpu_ms=round(record['cpu_s'] * 1000, 3))
+        if 'peak_mb' in record:
+            args['peak_mb'] = round(record['peak_mb'], 3)
+        events.append({
+            'name': record['name'],
+            'ph': 'X',
+            'ts': record['start'] * 1e6,
+            'dur': record['wall_s'] * 1e6,
+            'pid': record.get('process', pid),
+            'tid': record['thread'],
+            'args': args,
+        })
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)